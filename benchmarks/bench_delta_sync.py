@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Compare la copie complète de menu.xml au transfert différentiel (signature .sig) à travers
+un lien lent simulé : chaque ouverture et chaque seek coûtent une latence, chaque octet lu
+est limité par le débit choisi. Le menu local est la version d'origine, le menu du serveur
+en est une version modifiée.
+
+    python bench_delta_sync.py --sizes 1MB 10MB --bandwidth 2MB --latency 20
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import delta_sync
+import station_sync
+from storage import FileSystemStorage
+from xmlbench.generators import format_size, parse_size, write_menu
+
+
+class SlowFile:
+    """Fichier en lecture seule derrière un lien de ``bandwidth`` octets/s et ``latency`` s d'aller-retour."""
+
+    def __init__(self, path: str, bandwidth: float, latency: float, counter: dict):
+        time.sleep(latency)
+        self.f = open(path, 'rb')
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.counter = counter
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.counter["bytes"] += len(data)
+        time.sleep(len(data) / self.bandwidth)
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        time.sleep(self.latency)
+        return self.f.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.f.tell()
+
+    def seekable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        return self.f.fileno()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def edit(data: bytes, kind: str) -> bytes:
+    out = bytearray(data)
+    if kind == "insertion":
+        middle = len(out) // 2
+        out[middle:middle] = '\t\t\t<item ID="NOUVEAU" Name="Plat du jour" Price="12.99" />\r\n'.encode("utf-8")
+    elif kind == "prix":
+        for i in range(1, 11):
+            position = out.find(b'Price="', len(out) * i // 12)
+            out[position + 7:position + 9] = b"77"
+    elif kind == "suppression":
+        start = len(out) // 3
+        del out[start:start + len(out) // 50]
+    elif kind == "complet":
+        out = bytearray(out.replace(b"Item", b"Plat"))
+    return bytes(out)
+
+
+def pull(server: str, station: str, delta: bool, bandwidth: float, latency: float):
+    counter = {"bytes": 0}
+    puller = station_sync.StationPull("bench", station, files=["menu.xml"],
+                                      delta_files=None if delta else [], deadline=3600,
+                                      opener=lambda path: SlowFile(path, bandwidth, latency, counter))
+    puller.source_root = server
+    start = time.perf_counter()
+    puller.run()
+    elapsed = time.perf_counter() - start
+    event = puller.results["menu.xml"]
+    if event.status != station_sync.COPIED:
+        raise RuntimeError(f"menu.xml non copié : {event.status} {event.message}")
+    return elapsed, counter["bytes"], event.message
+
+
+def run(size: int, kinds, bandwidth: float, latency: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        original = os.path.join(tmp, "original.xml")
+        with open(original, "wb") as f:
+            write_menu(f, size)
+        with open(original, "rb") as f:
+            data = f.read()
+
+        for kind in kinds:
+            server = os.path.join(tmp, "serveur")
+            station = os.path.join(tmp, "station")
+            shutil.rmtree(server, ignore_errors=True)
+            os.makedirs(server)
+            with open(os.path.join(server, "menu.xml"), "wb") as f:
+                f.write(edit(data, kind))
+            start = time.perf_counter()
+            delta_sync.publish_signature(FileSystemStorage(), os.path.join(server, "menu.xml"))
+            signature_time = time.perf_counter() - start
+
+            results = {}
+            for mode in ("complet", "delta"):
+                shutil.rmtree(station, ignore_errors=True)
+                os.makedirs(station)
+                shutil.copyfile(original, os.path.join(station, "menu.xml"))
+                results[mode] = pull(server, station, mode == "delta", bandwidth, latency)
+                if not filecmp.cmp(os.path.join(server, "menu.xml"), os.path.join(station, "menu.xml"), shallow=False):
+                    raise RuntimeError(f"menu.xml reconstruit différent ({mode}, {kind})")
+
+            full_time, full_bytes, _ = results["complet"]
+            delta_time, delta_bytes, message = results["delta"]
+            print(f"{format_size(size):>7} {kind:12} copie {full_time:7.2f} s {full_bytes / 1024:9.1f} Ko | "
+                  f"delta {delta_time:7.2f} s {delta_bytes / 1024:9.1f} Ko (x{full_time / delta_time:.1f}) | "
+                  f"signature {signature_time * 1000:.0f} ms | {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transfert différentiel de menu.xml sur lien lent simulé")
+    parser.add_argument("--sizes", nargs="+", default=["1MB", "10MB"])
+    parser.add_argument("--edits", nargs="+", default=["insertion", "prix", "suppression", "complet"],
+                        choices=["aucune", "insertion", "prix", "suppression", "complet"])
+    parser.add_argument("--bandwidth", default="2MB", help="Débit du lien par seconde (ex: 500KB, 2MB)")
+    parser.add_argument("--latency", type=float, default=20.0, help="Aller-retour en ms par ouverture/seek")
+    args = parser.parse_args()
+
+    print(f"Lien simulé : {args.bandwidth}/s, {args.latency:.0f} ms d'aller-retour")
+    for size in args.sizes:
+        run(parse_size(size), args.edits, parse_size(args.bandwidth), args.latency / 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Compare la mise à jour de l'entête de layout.xml par patch d'octets à l'ancienne
+méthode ElementTree (parse complet + réécriture) sur des layouts de tailles croissantes."""
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from config_manager import patch_header_values
+
+
+def make_layout(n_lines: int) -> bytes:
+    body = "".join(f'\t\t<value center="False" text="Ligne {i}" bold="False" />\r\n' for i in range(n_lines))
+    return ('<?xml version="1.0" encoding="utf-8"?>\r\n<Layout>\r\n\t<Header>\r\n'
+            '\t\t<value center="True" text="A" />\r\n'
+            '\t\t<value center="True" text="B" />\r\n'
+            '\t\t<value center="True" text="C" />\r\n'
+            '\t</Header>\r\n\t<Body>\r\n' + body + '\t</Body>\r\n</Layout>\r\n').encode("utf-8")
+
+
+def legacy_update(data: bytes, lines: list) -> bytes:
+    root = ET.fromstring(data)
+    values = root.find("Header").findall("value[@center='True']")
+    for element, line in zip(values, lines):
+        element.set("text", line)
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def run(n_lines: int, repeat: int = 20):
+    data = make_layout(n_lines)
+    lines = ["RESTO ABC", "123 RUE PRINCIPALE", "MONTREAL, QUEBEC, H1A 2B3"]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        legacy = legacy_update(data, lines)
+    legacy_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        patched = patch_header_values(data, lines)
+    patch_time = (time.perf_counter() - start) / repeat
+
+    expected = data
+    for old, line in zip(["A", "B", "C"], lines):
+        expected = expected.replace(f'text="{old}"'.encode(), f'text="{line}"'.encode(), 1)
+    untouched = patched == expected
+    print(f"{len(data) / 1024:9.1f} Ko : ElementTree {legacy_time * 1000:8.2f} ms "
+          f"({'reformaté' if legacy != data else 'identique'}) | patch {patch_time * 1000:8.3f} ms "
+          f"(x{legacy_time / patch_time:.0f}, reste du fichier {'intact' if untouched else 'modifié'})")
+
+
+if __name__ == "__main__":
+    for n_lines in [10, 1000, 20000]:
+        run(n_lines)
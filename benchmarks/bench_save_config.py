@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Compare le temps de save_config_data (passe unique) à l'ancienne méthode
+(re.search + re.sub par clé) sur un config.xml de plusieurs centaines d'attributs."""
+import os
+import re
+import sys
+import tempfile
+import time
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from config_manager import XMLConfigManager, XMLDocumentCache, replace_attributes
+
+logging.disable(logging.WARNING)
+
+
+def make_config(n_attributes: int) -> str:
+    attrs = " ".join(f'Key_{i:04d}="value_{i}"' for i in range(n_attributes))
+    return f'<?xml version="1.0" encoding="utf-8"?>\n<Config {attrs} />\n'
+
+
+def legacy_save(content: str, data: dict) -> str:
+    for key, value in data.items():
+        if re.search(rf'{key}="[^"]*"', content):
+            content = re.sub(rf'{key}="[^"]*"', f'{key}="{value}"', content)
+    return content
+
+
+def run(n_attributes: int, n_keys: int, repeat: int = 20):
+    content = make_config(n_attributes)
+    data = {f"Key_{i:04d}": f"new_{i}" for i in range(0, n_attributes, max(1, n_attributes // n_keys))}
+    # Deux jeux de valeurs en alternance : chaque sauvegarde modifie réellement le fichier,
+    # sinon le suivi des valeurs déjà écrites la réduit à une comparaison.
+    variants = [{key: f"{value}_{i}" for key, value in data.items()} for i in range(2)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, "config.xml")
+        with open(config_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        manager = XMLConfigManager(config_path, os.path.join(tmp, "devices.xml"),
+                                   os.path.join(tmp, "menu.xml"), documents=XMLDocumentCache())
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            legacy_save(content, data)
+        legacy = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            replace_attributes(content, data)
+        batched = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for i in range(repeat):
+            manager.save_config_data(variants[i % 2])
+        full_save = (time.perf_counter() - start) / repeat
+
+    print(f"{n_attributes:5d} attributs, {len(data):4d} clés : "
+          f"ancien {legacy * 1000:8.2f} ms | passe unique {batched * 1000:8.2f} ms "
+          f"(x{legacy / batched:.1f}) | save_config_data complet {full_save * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    for n_attributes, n_keys in [(50, 23), (300, 23), (800, 23), (800, 400)]:
+        run(n_attributes, n_keys)
@@ -0,0 +1,10 @@
+"""Suite de benchmarks de XMLConfigManager sur des données synthétiques.
+
+Depuis le dossier benchmarks :
+    python -m xmlbench --sizes 1KB 1MB 100MB --output resultats.json
+    python -m xmlbench --sizes 1KB 1MB --compare resultats.json
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
@@ -0,0 +1,43 @@
+import argparse
+import sys
+from typing import List, Optional
+
+from .generators import parse_size
+from .runner import OPERATIONS, compare, load_results, run_suite, save_results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="xmlbench", description="Benchmarks de XMLConfigManager")
+    parser.add_argument("--sizes", nargs="+", default=["1KB", "1MB", "10MB"],
+                        help="Tailles de layout.xml/menu.xml (1KB à 100MB)")
+    parser.add_argument("--repeat", type=int, default=5, help="Répétitions par mesure (médiane)")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=None)
+    parser.add_argument("--config-extra", type=int, default=0, help="Attributs supplémentaires dans config.xml")
+    parser.add_argument("--devices", type=int, default=4, help="Nombre d'appareils dans devices.xml")
+    parser.add_argument("--workdir", default=None, help="Dossier des fichiers générés (défaut : dossier temporaire)")
+    parser.add_argument("--output", default=None, help="Fichier JSON des résultats")
+    parser.add_argument("--compare", default=None, metavar="REFERENCE", help="JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Ratio au-delà duquel une mesure régresse")
+    args = parser.parse_args(argv)
+
+    results = run_suite([parse_size(size) for size in args.sizes], args.repeat, args.operations,
+                        args.config_extra, args.devices, args.workdir)
+    if args.output:
+        save_results(args.output, results)
+        print(f"Résultats écrits dans {args.output}")
+
+    if not args.compare:
+        return 0
+
+    regressions = compare(results, load_results(args.compare), args.threshold)
+    for r in regressions:
+        unit = "ms" if r["metric"] == "wall_ms" else "Ko"
+        print(f"❌ {r['size']:>7} {r['operation']} {r['metric']} : {r['baseline']:.2f} → {r['current']:.2f} {unit} "
+              f"(x{r['ratio']:.2f})")
+    if not regressions:
+        print(f"✅ Aucune régression (seuil x{args.threshold})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
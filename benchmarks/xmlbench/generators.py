@@ -0,0 +1,115 @@
+"""Générateurs de config.xml, devices.xml, layout.xml et menu.xml synthétiques de taille choisie."""
+import os
+import re
+from typing import BinaryIO
+
+from config_model import CONFIG_DEFAULTS, Device, DeviceRegistry
+from config_manager import canonical_xml, escape_attribute
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+WRITE_CHUNK = 1024 * 1024
+
+
+def parse_size(text: str) -> int:
+    m = _SIZE_RE.match(text)
+    if not m:
+        raise ValueError(f"Taille invalide : {text} (ex: 1KB, 10MB)")
+    return int(float(m.group(1)) * _UNITS[m.group(2).upper()])
+
+
+def format_size(size: int) -> str:
+    for unit in ("G", "M", "K"):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]}{unit}B"
+    return f"{size}B"
+
+
+def make_config(n_extra: int = 0) -> str:
+    attrs = dict(CONFIG_DEFAULTS)
+    attrs.update({"Server": "192.168.1.10", "Database": "192.168.1.10", "MEV_Commerce_Name": "Resto Démo"})
+    attrs.update({f"Extra_{i:05d}": f"valeur {i}" for i in range(n_extra)})
+    body = " ".join(f'{key}="{escape_attribute(value)}"' for key, value in attrs.items())
+    return f'<?xml version="1.0" encoding="utf-8"?>\r\n<Config {body} />\r\n'
+
+
+def make_devices(n_devices: int = 1) -> str:
+    registry = DeviceRegistry([Device(name="Receipt", ip="192.168.1.50")])
+    for i in range(1, n_devices):
+        registry.set(Device(name=f"Device_{i:03d}", ip=f"10.0.{i // 250}.{i % 250 + 1}"))
+    return canonical_xml(registry.to_element())
+
+
+def write_layout(f: BinaryIO, target: int):
+    head = ('<?xml version="1.0" encoding="utf-8"?>\r\n<Layout>\r\n\t<Header>\r\n'
+            '\t\t<value center="True" text="RESTO" bold="True" />\r\n'
+            '\t\t<value center="True" text="1 RUE" bold="False" />\r\n'
+            '\t\t<value center="True" text="VILLE" bold="False" />\r\n'
+            '\t</Header>\r\n\t<Body>\r\n').encode("utf-8")
+    tail = b'\t</Body>\r\n</Layout>\r\n'
+    f.write(head)
+    written = len(head) + len(tail)
+    buffer = []
+    i = 0
+    while written < target:
+        line = f'\t\t<value center="False" text="Ligne {i}" bold="False" />\r\n'.encode("utf-8")
+        buffer.append(line)
+        written += len(line)
+        i += 1
+        if len(buffer) >= 10000:
+            f.write(b"".join(buffer))
+            buffer.clear()
+    f.write(b"".join(buffer))
+    f.write(tail)
+
+
+def write_menu(f: BinaryIO, target: int, with_receipt: bool = False):
+    """Menu avec imprimantes routées puis catégories/items/options jusqu'à la taille visée, écrit en flux."""
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\r\n<Menu>\r\n\t<PRINTERS Text="PRINTERS">\r\n']
+    if with_receipt:
+        parts.append('\t\t<Printer Name="Receipt" DriverName="Receipt" list_Events="|Receipt,Reports|" />\r\n')
+    for name in ("Kitchen", "Bar"):
+        parts.append(f'\t\t<Printer Name="{name}" DriverName="{name}" list_Categories="|C0001|" '
+                     f'list_Items="" Catch_All="0" IP="" Port="" />\r\n')
+    parts.append('\t</PRINTERS>\r\n\t<CATEGORIES>\r\n')
+    head = "".join(parts).encode("utf-8")
+    tail = b'\t</CATEGORIES>\r\n</Menu>\r\n'
+    f.write(head)
+    written = len(head) + len(tail)
+
+    buffer = []
+    buffered = 0
+    category = item = 0
+    while written < target:
+        category += 1
+        chunk = [f'\t\t<category ID="C{category:04d}" Name="Catégorie {category}">\r\n']
+        for _ in range(20):
+            item += 1
+            chunk.append(f'\t\t\t<item ID="I{item:07d}" Name="Item {item}" Price="{item % 50}.99">\r\n'
+                         f'\t\t\t\t<option ID="O{item:07d}" Name="Option {item}" />\r\n'
+                         f'\t\t\t</item>\r\n')
+        chunk.append('\t\t</category>\r\n')
+        data = "".join(chunk).encode("utf-8")
+        buffer.append(data)
+        buffered += len(data)
+        written += len(data)
+        if buffered >= WRITE_CHUNK:
+            f.write(b"".join(buffer))
+            buffer.clear()
+            buffered = 0
+    f.write(b"".join(buffer))
+    f.write(tail)
+
+
+def generate_set(folder: str, size: int, config_extra: int = 0, n_devices: int = 4):
+    """Écrit config.xml, devices.xml, layout.xml (taille ``size``) et menu.xml (taille ``size``) dans ``folder``."""
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "config.xml"), "w", encoding="utf-8", newline="") as f:
+        f.write(make_config(config_extra))
+    with open(os.path.join(folder, "devices.xml"), "w", encoding="utf-8") as f:
+        f.write(make_devices(n_devices))
+    with open(os.path.join(folder, "layout.xml"), "wb") as f:
+        write_layout(f, size)
+    with open(os.path.join(folder, "menu.xml"), "wb") as f:
+        write_menu(f, size)
@@ -0,0 +1,150 @@
+"""Mesure les opérations de XMLConfigManager (temps mur et pic mémoire tracemalloc) et compare à une référence."""
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config_manager import XMLConfigManager, XMLDocumentCache
+from storage import FileSystemStorage
+
+from .generators import format_size, generate_set
+
+OPERATIONS = [
+    "load_config_data",
+    "save_config_data",
+    "load_devices_data",
+    "update_layout_header",
+    "ensure_receipt_printer_in_menu",
+]
+
+NOISE_FLOOR_MS = 1.0
+
+
+def _manager(folder: str) -> XMLConfigManager:
+    return XMLConfigManager(storage=FileSystemStorage(folder), documents=XMLDocumentCache(), auto_snapshot=False)
+
+
+def _operation(name: str, folder: str, pristine_menu: str) -> Tuple[Callable[[int], None], Callable[[int], None]]:
+    """Retourne (préparation hors chrono, opération chronométrée) pour l'itération i."""
+    holder = {}
+
+    def fresh(i: int):
+        holder["manager"] = _manager(folder)
+
+    if name == "load_config_data":
+        return fresh, lambda i: holder["manager"].load_config_data()
+
+    if name == "save_config_data":
+        def prepare(i: int):
+            fresh(i)
+            holder["manager"].load_config_data()
+        return prepare, lambda i: holder["manager"].save_config_data(
+            {"Server": f"192.168.1.{10 + i % 2}", "GUI_Font_Size": str(12 + i % 2)})
+
+    if name == "load_devices_data":
+        return fresh, lambda i: holder["manager"].load_devices_data()
+
+    if name == "update_layout_header":
+        return fresh, lambda i: holder["manager"].update_layout_header(
+            f"Resto {i % 2}", "123", "Rue Principale", "Montréal", "H1A 2B3")
+
+    if name == "ensure_receipt_printer_in_menu":
+        def prepare(i: int):
+            shutil.copyfile(pristine_menu, os.path.join(folder, "menu.xml"))
+            fresh(i)
+        return prepare, lambda i: holder["manager"].ensure_receipt_printer_in_menu()
+
+    raise ValueError(f"Opération inconnue : {name}")
+
+
+def measure(name: str, folder: str, pristine_menu: str, repeat: int) -> Dict:
+    prepare, run = _operation(name, folder, pristine_menu)
+    timings = []
+    for i in range(repeat):
+        prepare(i)
+        start = time.perf_counter()
+        run(i)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    prepare(repeat)
+    tracemalloc.start()
+    try:
+        run(repeat)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "peak_kb": peak / 1024,
+    }
+
+
+def run_suite(sizes: List[int], repeat: int = 5, operations: Optional[List[str]] = None,
+              config_extra: int = 0, n_devices: int = 4, workdir: Optional[str] = None) -> Dict:
+    logging.disable(logging.WARNING)
+    results = []
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+                folder = os.path.join(tmp, "xml")
+                generate_set(folder, size, config_extra, n_devices)
+                pristine_menu = os.path.join(tmp, "menu.pristine.xml")
+                shutil.copyfile(os.path.join(folder, "menu.xml"), pristine_menu)
+                for name in operations or OPERATIONS:
+                    result = {"operation": name, "size": format_size(size), "bytes": size}
+                    result.update(measure(name, folder, pristine_menu, repeat))
+                    results.append(result)
+                    print(f"{result['size']:>7} {name:32} {result['wall_ms']:10.2f} ms "
+                          f"(min {result['min_ms']:.2f}) pic {result['peak_kb']:10.1f} Ko", file=sys.stderr)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 1.25) -> List[Dict]:
+    """Régressions : temps médian ou pic mémoire au-delà de ``threshold`` fois la référence."""
+    reference = {(r["operation"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        base = reference.get((result["operation"], result["size"]))
+        if base is None:
+            continue
+        for metric, floor in (("wall_ms", NOISE_FLOOR_MS), ("peak_kb", 64.0)):
+            if result[metric] > base[metric] * threshold and result[metric] - base[metric] > floor:
+                regressions.append({
+                    "operation": result["operation"],
+                    "size": result["size"],
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": result[metric],
+                    "ratio": result[metric] / base[metric] if base[metric] else float("inf"),
+                })
+    return regressions
+
+
+def load_results(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(path: str, results: Dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
@@ -1,50 +1,537 @@
 import os
 import re
+import threading
+import time
+from functools import lru_cache
 import xml.etree.ElementTree as ET
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple, Union, Callable, BinaryIO
 import logging
+import config_sidecar
+import delta_sync
+from config_model import (POSConfig, Device, DeviceRegistry, CONFIG_KEYS, CONFIG_DEFAULTS,
+                          DEVICES_DEFAULTS)
+import menu_editor
+from menu_index import MenuIndex
+from snapshots import SnapshotStore
+from storage import DEFAULT_ROOT, FileSystemStorage, ShareStorage, StorageBackend, local_storage
+import xml_manifest
+from xml_watcher import FileChange, XMLFolderWatcher
 
 logger = logging.getLogger(__name__)
 
+_ATTRS = r'(?:\s+[^\s=<>/]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*'
+_TOKEN_RE = re.compile(
+    r'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[?!][^>]*>|</[^>]*>'
+    rf'|<([A-Za-z_][\w.:\-]*)({_ATTRS})\s*/?>',
+    re.DOTALL
+)
+_ATTR_RE = re.compile(r'([^\s=<>/]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_ENTITY_RE = re.compile(r'&(?:#(\d+)|#x([0-9A-Fa-f]+)|(lt|gt|amp|quot|apos));')
+_NAMED_ENTITIES = {"lt": "<", "gt": ">", "amp": "&", "quot": '"', "apos": "'"}
+_TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;",
+                          "\t": "&#9;", "\n": "&#10;", "\r": "&#13;"})
 
-class XMLConfigManager:
-    def __init__(self, config_path: str = r"c:\pos\xml\config.xml", 
-                 devices_path: str = r"c:\pos\xml\devices.xml",
-                 menu_path: str = r"c:\pos\xml\menu.xml"):
-        self.config_path = config_path
-        self.devices_path = devices_path
-        self.menu_path = menu_path
-        self._ensure_paths_exist()
-
-    def _ensure_paths_exist(self):
-        for path in [self.config_path, self.devices_path]:
-            dir_path = os.path.dirname(path)
-            if dir_path and not os.path.exists(dir_path):
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>'
+
+
+def escape_attribute(value: str) -> str:
+    return value.translate(_ESCAPES)
+
+
+def escape_text(value: str) -> str:
+    return value.translate(_TEXT_ESCAPES)
+
+
+def _canonical_lines(elem: ET.Element, depth: int, out: List[str]):
+    indent = "\t" * depth
+    attrs = "".join(f' {name}="{escape_attribute(value)}"' for name, value in elem.attrib.items())
+    text = elem.text if elem.text and elem.text.strip() else ""
+    children = list(elem)
+    if not children:
+        if text:
+            out.append(f"{indent}<{elem.tag}{attrs}>{escape_text(text)}</{elem.tag}>")
+        else:
+            out.append(f"{indent}<{elem.tag}{attrs} />")
+        return
+    out.append(f"{indent}<{elem.tag}{attrs}>" + (escape_text(text.strip()) if text else ""))
+    for child in children:
+        if isinstance(child.tag, str):
+            _canonical_lines(child, depth + 1, out)
+    out.append(f"{indent}</{elem.tag}>")
+
+
+def canonical_xml(root: ET.Element) -> str:
+    """Forme canonique commune à tous les écrivains : déclaration fixe, attributs dans l'ordre du document,
+    guillemets doubles, une balise par ligne indentée par tabulations, éléments vides en « /> »,
+    espaces non significatifs retirés. Un même contenu logique donne toujours les mêmes octets."""
+    out = [XML_DECLARATION]
+    _canonical_lines(root, 0, out)
+    return "\n".join(out) + "\n"
+
+
+def _entity_repl(m: "re.Match") -> str:
+    if m.group(1):
+        return chr(int(m.group(1)))
+    if m.group(2):
+        return chr(int(m.group(2), 16))
+    return _NAMED_ENTITIES[m.group(3)]
+
+
+def unescape_attribute(value: str) -> str:
+    if "&" not in value:
+        return value
+    return _ENTITY_RE.sub(_entity_repl, value)
+
+
+@lru_cache(maxsize=32)
+def _attribute_pattern(keys: Tuple[str, ...]) -> "re.Pattern":
+    names = "|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True))
+    return re.compile(rf'(?<=\s)({names})(\s*=\s*)(?:"[^"]*"|\'[^\']*\')')
+
+
+def replace_attributes(content: str, values: Dict[str, str]) -> Tuple[str, set]:
+    if not values:
+        return content, set()
+    found = set()
+    escaped = {k: escape_attribute(str(v)) for k, v in values.items()}
+
+    def repl(m: "re.Match") -> str:
+        key = m.group(1)
+        found.add(key)
+        return f'{key}{m.group(2)}"{escaped[key]}"'
+
+    return _attribute_pattern(tuple(sorted(values))).sub(repl, content), found
+
+
+_XNAME_ESCAPE_RE = re.compile(r"_x([0-9A-Fa-f]{4})_")
+
+
+@lru_cache(maxsize=1024)
+def _decode_xml_name(value: str) -> str:
+    return _XNAME_ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 16)), value)
+
+
+def decode_xml_name(value: str) -> str:
+    if "_x" not in value:
+        return value
+    return _decode_xml_name(value)
+
+
+def is_xml_name_encoded(value: str) -> bool:
+    return "_x" in value and _XNAME_ESCAPE_RE.search(value) is not None
+
+
+def _is_name_char(c: str, first: bool) -> bool:
+    if c == "_" or c.isalpha():
+        return True
+    return not first and (c.isdigit() or c in ".-")
+
+
+@lru_cache(maxsize=1024)
+def encode_xml_name(value: str) -> str:
+    out = []
+    for i, c in enumerate(value):
+        if c == "_" and _XNAME_ESCAPE_RE.match(value, i):
+            out.append("_x005F_")
+        elif _is_name_char(c, i == 0):
+            out.append(c)
+        else:
+            out.append(f"_x{ord(c):04X}_")
+    return "".join(out)
+
+
+_TOKEN_RE_BYTES = re.compile(_TOKEN_RE.pattern.encode("ascii"), re.DOTALL)
+_ATTR_RE_BYTES = re.compile(_ATTR_RE.pattern.encode("ascii"))
+
+
+def patch_header_values(data: bytes, lines: List[str]) -> Optional[bytes]:
+    depth = 0
+    in_header = False
+    spans = []
+    for m in _TOKEN_RE_BYTES.finditer(data):
+        token = m.group(0)
+        tag = m.group(1)
+        if tag is None:
+            if token.startswith(b"</"):
+                depth -= 1
+                if in_header and depth == 1:
+                    break
+            continue
+        if in_header and depth == 2 and tag == b"value":
+            attrs = {}
+            for a in _ATTR_RE_BYTES.finditer(m.group(2)):
+                group = 2 if a.group(2) is not None else 3
+                attrs[a.group(1)] = (a.group(group), m.start(2) + a.start(group), m.start(2) + a.end(group), group)
+            if b"center" in attrs and unescape_attribute(attrs[b"center"][0].decode("utf-8")) == "True":
+                if b"text" not in attrs:
+                    return None
+                spans.append(attrs[b"text"])
+                if len(spans) == len(lines):
+                    break
+        elif depth == 1 and tag == b"Header" and not in_header:
+            if token.endswith(b"/>"):
+                return None
+            in_header = True
+        if not token.endswith(b"/>"):
+            depth += 1
+
+    if len(spans) < len(lines):
+        return None
+    if [unescape_attribute(span[0].decode("utf-8")) for span in spans] == lines:
+        return data
+
+    patched = data
+    for (_, start, end, group), line in reversed(list(zip(spans, lines))):
+        value = escape_attribute(line)
+        if group == 3:
+            value = value.replace("'", "&apos;")
+        patched = patched[:start] + value.encode("utf-8") + patched[end:]
+    return patched
+
+
+class XMLAttributeIndex:
+    def __init__(self, root_tag: str = "", root: Optional[Dict[str, str]] = None,
+                 elements: Optional[Dict[str, List[Dict[str, str]]]] = None):
+        self.root_tag = root_tag
+        self.root = root if root is not None else {}
+        self.elements = elements if elements is not None else {}
+        self._flat = dict(self.root)
+        for attr_list in self.elements.values():
+            for attrs in attr_list:
+                for key, value in attrs.items():
+                    self._flat.setdefault(key, value)
+
+    @classmethod
+    def from_text(cls, content: str) -> "XMLAttributeIndex":
+        root_tag = ""
+        root: Dict[str, str] = {}
+        elements: Dict[str, List[Dict[str, str]]] = {}
+        for m in _TOKEN_RE.finditer(content):
+            tag = m.group(1)
+            if tag is None:
+                continue
+            attrs = {a.group(1): unescape_attribute(a.group(2) if a.group(2) is not None else a.group(3))
+                     for a in _ATTR_RE.finditer(m.group(2))}
+            if not root_tag:
+                root_tag = tag
+                root = attrs
+            else:
+                elements.setdefault(tag, []).append(attrs)
+        return cls(root_tag, root, elements)
+
+    @classmethod
+    def from_maps(cls, root_tag: str, root: Dict[str, str], extra: Dict[str, str]) -> "XMLAttributeIndex":
+        index = cls(root_tag, root)
+        for key, value in extra.items():
+            index._flat.setdefault(key, value)
+        return index
+
+    @property
+    def flat(self) -> Dict[str, str]:
+        return self._flat
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self._flat.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._flat
+
+
+class XMLDocument:
+    def __init__(self, path: str, text: str, stamp: Tuple[int, int]):
+        self.path = path
+        self.text = text
+        self.stamp = stamp
+        self._index: Optional[XMLAttributeIndex] = None
+
+    @property
+    def index(self) -> XMLAttributeIndex:
+        if self._index is None:
+            self._index = XMLAttributeIndex.from_text(self.text)
+        return self._index
+
+
+class XMLDocumentCache:
+    def __init__(self):
+        self._documents: Dict[str, XMLDocument] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path: str, storage: StorageBackend = local_storage) -> str:
+        return storage.key(path)
+
+    def get_fresh(self, path: str, stamp: Tuple[int, int],
+                  storage: StorageBackend = local_storage) -> Optional[XMLDocument]:
+        with self._lock:
+            doc = self._documents.get(storage.key(path))
+            if doc is not None and doc.stamp == stamp:
+                self.hits += 1
+                return doc
+        return None
+
+    def load(self, path: str, storage: StorageBackend = local_storage) -> XMLDocument:
+        key = storage.key(path)
+        stamp = storage.stamp(path)
+        with self._lock:
+            doc = self._documents.get(key)
+            if doc is not None and doc.stamp == stamp:
+                self.hits += 1
+                return doc
+            self.misses += 1
+        doc = XMLDocument(path, storage.read_text(path), stamp)
+        with self._lock:
+            self._documents[key] = doc
+        return doc
+
+    def store(self, path: str, text: str, storage: StorageBackend = local_storage) -> XMLDocument:
+        doc = XMLDocument(path, text, storage.stamp(path))
+        with self._lock:
+            self._documents[storage.key(path)] = doc
+        return doc
+
+    def invalidate(self, path: Optional[str] = None, storage: StorageBackend = local_storage):
+        with self._lock:
+            if path is None:
+                self._documents.clear()
+            else:
+                self._documents.pop(storage.key(path), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "documents": len(self._documents)}
+
+
+document_cache = XMLDocumentCache()
+
+FILE_ORDER = ["config.xml", "devices.xml", "layout.xml", "menu.xml"]
+
+
+class XMLTransaction:
+    def __init__(self, documents: XMLDocumentCache, storage: StorageBackend = local_storage):
+        self.documents = documents
+        self.storage = storage
+        self._pending: Dict[str, Union[str, Callable[[BinaryIO], None]]] = {}
+        self.timings = {"stage": 0.0, "fsync": 0.0, "swap": 0.0}
+
+    def add(self, path: str, content: Union[str, Callable[[BinaryIO], None]]):
+        self._pending[path] = content
+
+    @property
+    def paths(self) -> List[str]:
+        return list(self._pending)
+
+    def _ordered(self) -> List[str]:
+        def rank(path: str):
+            name = os.path.basename(path).lower()
+            return (FILE_ORDER.index(name) if name in FILE_ORDER else len(FILE_ORDER), name)
+        return sorted(self._pending, key=rank)
+
+    def commit(self):
+        paths = self._ordered()
+        handles = []
+        staged: List[Tuple[str, str]] = []
+        backups: Dict[str, Optional[str]] = {}
+        swapped: List[str] = []
+        try:
+            start = time.perf_counter()
+            for path in paths:
+                tmp = f"{path}.tmp"
+                content = self._pending[path]
+                f = self.storage.open_write(tmp, text=not callable(content))
+                handles.append(f)
+                staged.append((path, tmp))
+                if callable(content):
+                    content(f)
+                else:
+                    f.write(content)
+                f.flush()
+            self.timings["stage"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            while handles:
+                f = handles.pop(0)
+                self.storage.sync(f)
+                f.close()
+            self.timings["fsync"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for path, _ in staged:
+                backup = None
+                if self.storage.exists(path):
+                    backup = f"{path}.bak"
+                    self.storage.discard(backup)
+                    self.storage.backup(path, backup)
+                backups[path] = backup
+            for path, tmp in staged:
+                self.storage.replace(tmp, path)
+                swapped.append(path)
+            self.timings["swap"] = time.perf_counter() - start
+        except Exception:
+            for f in handles:
+                f.close()
+            for path in reversed(swapped):
+                backup = backups.get(path)
                 try:
-                    os.makedirs(dir_path, exist_ok=True)
-                    logger.info(f"Créé le répertoire : {dir_path}")
-                except Exception as e:
-                    logger.warning(f"Impossible de créer {dir_path}: {e}")
-        
-        if not os.path.exists(self.config_path):
+                    if backup:
+                        self.storage.replace(backup, path)
+                    else:
+                        self.storage.remove(path)
+                except OSError as e:
+                    logger.error(f"Impossible de restaurer {path} : {e}")
+            for path, tmp in staged:
+                self.storage.discard(tmp)
+                self.documents.invalidate(path, self.storage)
+            for backup in backups.values():
+                if backup:
+                    self.storage.discard(backup)
+            raise
+
+        for path in paths:
+            backup = backups.get(path)
+            if backup:
+                self.storage.discard(backup)
+            content = self._pending[path]
+            if callable(content):
+                self.documents.invalidate(path, self.storage)
+            else:
+                self.documents.store(path, content, self.storage)
+        logger.info(f"Transaction validée ({len(paths)} fichiers) : "
+                    + ", ".join(f"{phase} {duration * 1000:.1f} ms" for phase, duration in self.timings.items()))
+
+UNCHANGED = object()
+
+WRITTEN = "written"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+def _default_document(tag: str, defaults: Dict[str, str]) -> str:
+    return canonical_xml(ET.Element(tag, defaults))
+
+
+DEFAULT_CONFIG = _default_document("Config", CONFIG_DEFAULTS)
+DEFAULT_DEVICES = _default_document("Devices", DEVICES_DEFAULTS)
+
+RECEIPT_PRINTER_LINE = '<Printer Name="Receipt" DriverName="Receipt" MEV="1" Full_Size="0" Label="0" RAW="0" Catch_All="0" Print_Tables="1" Print_Counter="1" Print_Pickup="1" Print_Delivery="1" list_Events="|Receipt,Reports|" list_Categories="" list_Items="" list_Options="" list_Choices="" IP="" Port="" Auto_Remove_Tickets="0" />'
+
+
+class XMLConfigManager:
+    def __init__(self, config_path: Optional[str] = None,
+                 devices_path: Optional[str] = None,
+                 menu_path: Optional[str] = None,
+                 documents: Optional[XMLDocumentCache] = None,
+                 storage: Optional[StorageBackend] = None,
+                 layout_path: Optional[str] = None,
+                 auto_snapshot: bool = True):
+        self.storage = storage if storage is not None else FileSystemStorage(DEFAULT_ROOT)
+        self.config_path = config_path or self.storage.path("config.xml")
+        self.devices_path = devices_path or self.storage.path("devices.xml")
+        self.menu_path = menu_path or self.storage.path("menu.xml")
+        self.layout_path = layout_path or os.path.join(os.path.dirname(self.config_path), "layout.xml")
+        self.documents = documents if documents is not None else document_cache
+        self._loaded_values: Dict[str, Dict[str, str]] = {}
+        self.last_commit_timings: Dict[str, float] = {}
+        self._config_checked = False
+        self.auto_snapshot = auto_snapshot
+        self.last_snapshot: Optional[str] = None
+        self._publish_lock = threading.Lock()
+
+    @classmethod
+    def for_server(cls, server: str, documents: Optional[XMLDocumentCache] = None) -> "XMLConfigManager":
+        return cls(documents=documents, storage=ShareStorage(server))
+
+    def _ensure_config(self):
+        if self._config_checked:
+            return
+        self._config_checked = True
+        if not self.storage.exists(self.config_path):
             self._create_default_config()
     
     def _create_default_config(self):
         try:
-            default_config = '''<?xml version="1.0" encoding="utf-8"?>
-<Config Database="" Server="" Replication="0" Auto_Logout="0" GUI_Dark_Mode="1" 
-        Debut_Print="0" Auto_Print="0" Use_Floorplan="1" Use_Retail="1" 
-        Use_Counter="1" Use_Pickup="1" Use_Delivery="1" GUI_Font_Size="12" 
-        GUI_List_Height="30" MEV_UserName="" MEV_Gst="" MEV_Qst="" 
-        MEV_Auth_Code="" MEV_File_Number="" MEV_Address="" MEV_Zip="" 
-        MEV_Sector="RES" MEV_Commerce_Name="" />
-'''
-            with open(self.config_path, 'w', encoding="utf-8") as f:
-                f.write(default_config)
+            self._write_document(self.config_path, DEFAULT_CONFIG)
             logger.info(f"Fichier de configuration par défaut créé : {self.config_path}")
         except Exception as e:
             logger.error(f"Impossible de créer le fichier de configuration par défaut : {e}")
 
+    def _read_document(self, path: str) -> XMLDocument:
+        return self.documents.load(path, self.storage)
+
+    def _exists(self, path: str) -> bool:
+        return self.storage.exists(path)
+
+    def _write_document(self, path: str, content: Union[str, Callable[[BinaryIO], None]]):
+        transaction = XMLTransaction(self.documents, self.storage)
+        transaction.add(path, content)
+        transaction.commit()
+        if self.storage.key(path) == self.storage.key(self.config_path):
+            self._refresh_config_sidecar()
+
+    def _read_sidecar(self) -> Optional[config_sidecar.ConfigSidecar]:
+        try:
+            data = self.storage.read_bytes(config_sidecar.sidecar_path(self.config_path))
+        except OSError:
+            return None
+        return config_sidecar.ConfigSidecar.from_bytes(data)
+
+    def _write_sidecar(self, sidecar: config_sidecar.ConfigSidecar):
+        self.storage.write_bytes(config_sidecar.sidecar_path(self.config_path), sidecar.to_bytes())
+
+    def _refresh_config_sidecar(self):
+        try:
+            doc = self._read_document(self.config_path)
+            digest = config_sidecar.source_digest(self.storage.read_bytes(self.config_path))
+            index = doc.index
+            extra = {k: v for k, v in index.flat.items() if k not in index.root}
+            self._write_sidecar(config_sidecar.ConfigSidecar(
+                doc.stamp, digest, index.root_tag, index.root, extra))
+        except Exception as e:
+            logger.warning(f"Impossible d'écrire le cache de config.xml : {e}")
+
+    def _config_index(self) -> XMLAttributeIndex:
+        stamp = self.storage.stamp(self.config_path)
+        doc = self.documents.get_fresh(self.config_path, stamp, self.storage)
+        if doc is not None:
+            return doc.index
+        
+        sidecar = self._read_sidecar()
+        if sidecar is not None:
+            if sidecar.stamp != stamp:
+                if config_sidecar.source_digest(self.storage.read_bytes(self.config_path)) != sidecar.digest:
+                    sidecar = None
+                if sidecar is not None:
+                    sidecar.stamp = stamp
+                    try:
+                        self._write_sidecar(sidecar)
+                    except OSError as e:
+                        logger.warning(f"Impossible de mettre à jour le cache de config.xml : {e}")
+            if sidecar is not None:
+                return XMLAttributeIndex.from_maps(sidecar.root_tag, sidecar.root, sidecar.extra)
+        
+        index = self._read_document(self.config_path).index
+        self._refresh_config_sidecar()
+        return index
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self.documents.stats()
+
+    def invalidate(self, path: Optional[str] = None):
+        self.documents.invalidate(path, self.storage)
+
+    def handle_changes(self, changes: List[FileChange]):
+        for change in changes:
+            self.invalidate(change.path)
+
+    def watcher(self, **options) -> Optional[XMLFolderWatcher]:
+        folder = self.storage.local_path(os.path.dirname(self.config_path) or ".")
+        if folder is None:
+            return None
+        watcher = XMLFolderWatcher(folder, **options)
+        watcher.subscribe(self.handle_changes)
+        return watcher
+
     def load_config_data(self, keys: Optional[List[str]] = None) -> Dict[str, str]:
         if keys is None:
             keys = [
@@ -54,19 +541,16 @@ class XMLConfigManager:
             ]
         
         data = {}
-        if not os.path.exists(self.config_path):
+        self._ensure_config()
+        if not self._exists(self.config_path):
             logger.warning(f"Fichier de configuration introuvable : {self.config_path}")
             return data
 
         try:
-            with open(self.config_path, 'r', encoding="utf-8") as f:
-                content = f.read()
-                for key in keys:
-                    m = re.search(rf'{key}="([^"]*)"', content)
-                    if m:
-                        data[key] = m.group(1)
-                    else:
-                        data[key] = ""
+            index = self._config_index()
+            for key in keys:
+                data[key] = decode_xml_name(index.get(key, ""))
+            self._remember_values(self.config_path, {k: v for k, v in data.items() if k in index})
             logger.info(f"Configuration chargée avec succès : {len(data)} clés")
         except Exception as e:
             logger.error(f"Erreur lors du chargement de la configuration : {e}")
@@ -81,41 +565,81 @@ class XMLConfigManager:
         ]
         return self.load_config_data(keys)
 
-    def save_config_data(self, data: Dict[str, str]) -> bool:
-        if not os.path.exists(self.config_path):
-            logger.warning(f"Fichier de configuration introuvable, création d'un nouveau fichier")
-            self._create_default_config()
-            if not os.path.exists(self.config_path):
-                logger.error("Impossible de créer le fichier de configuration")
-                return False
+    def load_model(self) -> POSConfig:
+        return POSConfig.from_maps(self.load_config_data(CONFIG_KEYS), self.load_devices_data())
 
-        try:
-            with open(self.config_path, 'r', encoding="utf-8") as f:
-                content = f.read()
+    def _remember_values(self, path: str, data: Dict[str, str]):
+        self._loaded_values.setdefault(self.storage.key(path), {}).update(data)
 
-            for key, value in data.items():
-                if re.search(rf'{key}="[^"]*"', content):
-                    content = re.sub(rf'{key}="[^"]*"', f'{key}="{value}"', content)
-                else:
-                    logger.warning(f"Clé non trouvée dans le fichier : {key}")
+    def changed_fields(self, path: str, data: Dict[str, str]) -> Dict[str, str]:
+        loaded = self._loaded_values.get(self.storage.key(path), {})
+        return {k: v for k, v in data.items() if k not in loaded or loaded[k] != v}
+
+    def _current_text(self, path: str) -> Optional[str]:
+        if not self._exists(path):
+            return None
+        return self._read_document(path).text
 
-            with open(self.config_path, 'w', encoding="utf-8") as f:
-                f.write(content)
-            
-            logger.info("Configuration sauvegardée avec succès")
-            return True
+    def _prepare_document(self, path: str, render) -> Tuple[str, Optional[Union[str, Callable[[BinaryIO], None]]]]:
+        filename = os.path.basename(path)
+        try:
+            content = render()
+            if content is None:
+                return FAILED, None
+            if content is UNCHANGED or (isinstance(content, str) and content == self._current_text(path)):
+                logger.info(f"{filename} inchangé, écriture ignorée")
+                return SKIPPED, None
+            return WRITTEN, content
         except Exception as e:
-            logger.error(f"Erreur lors de la sauvegarde : {e}")
+            logger.error(f"Erreur lors de la préparation de {filename} : {e}")
+            return FAILED, None
+
+    def _save_document(self, path: str, render) -> str:
+        status, content = self._prepare_document(path, render)
+        if status == WRITTEN:
+            try:
+                self._write_document(path, content)
+                logger.info(f"{os.path.basename(path)} écrit")
+            except Exception as e:
+                logger.error(f"Erreur lors de la sauvegarde de {os.path.basename(path)} : {e}")
+                return FAILED
+        return status
+
+    def _render_config(self, data: Dict[str, str]) -> str:
+        if self._exists(self.config_path):
+            doc = self._read_document(self.config_path)
+            content, index = doc.text, doc.index
+        else:
+            content = DEFAULT_CONFIG
+            index = XMLAttributeIndex.from_text(content)
+
+        dirty = self.changed_fields(self.config_path, data)
+        dirty = {k: encode_xml_name(v) if is_xml_name_encoded(index.get(k, "")) else v
+                 for k, v in dirty.items()}
+        content, found = replace_attributes(content, dirty)
+        for key in dirty:
+            if key not in found:
+                logger.warning(f"Clé non trouvée dans le fichier : {key}")
+        return content
+
+    def save_config_data(self, data: Dict[str, str]) -> bool:
+        status = self._save_document(self.config_path, lambda: self._render_config(data))
+        if status == FAILED:
             return False
+        self._remember_values(self.config_path, data)
+        logger.info("Configuration sauvegardée avec succès")
+        return True
+
+    def write_tree(self, path: str, root: ET.Element):
+        self._write_document(path, canonical_xml(root))
 
     def update_xml_attribute(self, filepath: str, element_name: str, new_value: str) -> bool:
         try:
-            tree = ET.parse(filepath)
-            root = tree.getroot()
+            root = ET.fromstring(self._read_document(filepath).text)
             element = root.find(element_name)
             if element is not None:
                 element.text = new_value
-                tree.write(filepath, encoding="utf-8", xml_declaration=True)
+                self.write_tree(filepath, root)
                 logger.info(f"Élément {element_name} mis à jour avec succès")
                 return True
             else:
@@ -125,163 +649,221 @@ class XMLConfigManager:
             logger.error(f"Erreur lors de la mise à jour XML : {e}")
             return False
     
-    def load_devices_data(self) -> Dict[str, str]:
-        data = {}
-        if not os.path.exists(self.devices_path):
+    def load_devices(self) -> DeviceRegistry:
+        if not self._exists(self.devices_path):
             logger.warning(f"Fichier devices.xml introuvable : {self.devices_path}")
-            return data
+            return DeviceRegistry()
 
         try:
-            with open(self.devices_path, 'r', encoding="utf-8") as f:
-                content = f.read()
-                
-                m_ip = re.search(r'ip="([^"]*)"', content)
-                if m_ip:
-                    data['ip'] = m_ip.group(1)
-                else:
-                    data['ip'] = ""
-                
-                m_com = re.search(r'com="([^"]*)"', content)
-                if m_com:
-                    data['com'] = m_com.group(1)
-                else:
-                    data['com'] = ""
-                
-                m_baud = re.search(r'baud="([^"]*)"', content)
-                if m_baud:
-                    data['baud'] = m_baud.group(1)
-                else:
-                    data['baud'] = "9600"
-                
-                m_protocol = re.search(r'protocol="([^"]*)"', content)
-                if m_protocol:
-                    data['protocol'] = m_protocol.group(1)
-                else:
-                    data['protocol'] = "Web Network Printer"
-                
-            logger.info(f"Devices chargé : {data}")
+            registry = DeviceRegistry.from_text(self._read_document(self.devices_path).text)
+            logger.info(f"Devices chargé : {len(registry)} appareil(s) ({', '.join(registry.devices)})")
+            return registry
         except Exception as e:
             logger.error(f"Erreur lors du chargement de devices.xml : {e}")
-        
+            return DeviceRegistry()
+
+    def load_devices_data(self) -> Dict[str, str]:
+        primary = self.load_devices().primary
+        if primary is None:
+            return {}
+        data = {k: v for k, v in primary.to_attributes().items() if k in DEVICES_DEFAULTS}
+        self._remember_devices(data)
         return data
 
-    def save_devices_data(self, data: Dict[str, str]) -> bool:
-        if not os.path.exists(self.devices_path):
+    def _render_devices(self, data: Union[Dict[str, str], DeviceRegistry]) -> str:
+        if isinstance(data, DeviceRegistry):
+            return canonical_xml(data.to_element())
+
+        content = self._current_text(self.devices_path)
+        if content is None:
             logger.warning(f"Fichier devices.xml introuvable, création d'un nouveau fichier")
-            try:
-                default_devices = '''<?xml version="1.0" encoding="utf-8"?>
-<Devices ip="" com="" baud="9600" protocol="Web Network Printer" />
-'''
-                with open(self.devices_path, 'w', encoding="utf-8") as f:
-                    f.write(default_devices)
-                logger.info(f"Fichier devices.xml créé : {self.devices_path}")
-            except Exception as e:
-                logger.error(f"Impossible de créer devices.xml : {e}")
-                return False
+            content = DEFAULT_DEVICES
+        registry = DeviceRegistry.from_text(content)
 
-        try:
-            with open(self.devices_path, 'r', encoding="utf-8") as f:
-                content = f.read()
-
-            for key, value in data.items():
-                if key == 'ip':
-                    content = re.sub(r'ip="[^"]*"', f'ip="{value}"', content)
-                    if 'ip=' not in content:
-                        content = content.replace('<Devices ', f'<Devices ip="{value}" ')
-                elif key == 'com':
-                    content = re.sub(r'com="[^"]*"', f'com="{value}"', content)
-                    if 'com=' not in content:
-                        content = content.replace('<Devices ', f'<Devices com="{value}" ')
-                elif key == 'baud':
-                    content = re.sub(r'baud="[^"]*"', f'baud="{value}"', content)
-                    if 'baud=' not in content:
-                        content = content.replace('<Devices ', f'<Devices baud="{value}" ')
-                elif key == 'protocol':
-                    content = re.sub(r'protocol="[^"]*"', f'protocol="{value}"', content)
-                    if 'protocol=' not in content:
-                        content = content.replace('<Devices ', f'<Devices protocol="{value}" ')
-
-            with open(self.devices_path, 'w', encoding="utf-8") as f:
-                f.write(content)
-            
-            logger.info(f"Devices.xml sauvegardé avec succès : {data}")
-            return True
-        except Exception as e:
-            logger.error(f"Erreur lors de la sauvegarde de devices.xml : {e}")
+        values = {k: v for k, v in self.changed_fields(self.devices_path, data).items()
+                  if k in DEVICES_DEFAULTS}
+        if not values:
+            return content
+        primary = registry.primary or Device()
+        registry.set(Device.from_attributes(primary.name, {**primary.to_attributes(), **values}))
+        return canonical_xml(registry.to_element())
+
+    def _remember_devices(self, data: Union[Dict[str, str], DeviceRegistry]):
+        if isinstance(data, DeviceRegistry):
+            primary = data.primary
+            if primary is None:
+                return
+            data = {k: v for k, v in primary.to_attributes().items() if k in DEVICES_DEFAULTS}
+        self._remember_values(self.devices_path, data)
+
+    def save_devices(self, registry: DeviceRegistry) -> bool:
+        status = self._save_document(self.devices_path, lambda: self._render_devices(registry))
+        if status == FAILED:
             return False
+        self._remember_devices(registry)
+        logger.info(f"Devices.xml sauvegardé avec succès : {len(registry)} appareil(s)")
+        return True
 
-    def update_layout_header(self, commerce_name: str, address_num: str, address_street: str, 
-                            city: str, postal_code: str) -> bool:
-        layout_path = r"c:\pos\xml\layout.xml"
+    def save_devices_data(self, data: Dict[str, str]) -> bool:
+        status = self._save_document(self.devices_path, lambda: self._render_devices(data))
+        if status == FAILED:
+            return False
+        self._remember_values(self.devices_path, data)
+        logger.info(f"Devices.xml sauvegardé avec succès : {data}")
+        return True
+
+    def _render_layout_header(self, commerce_name: str, address_num: str, address_street: str,
+                              city: str, postal_code: str) -> Optional[str]:
+        layout_path = self.layout_path
         
-        if not os.path.exists(layout_path):
+        if not self._exists(layout_path):
             logger.warning(f"Fichier layout.xml introuvable : {layout_path}")
-            return False
+            return None
         
-        try:
-            tree = ET.parse(layout_path)
-            root = tree.getroot()
-            
-            header = root.find("Header")
-            if header is None:
-                logger.warning("Élément <Header> non trouvé dans layout.xml")
-                return False
-            
-            value_elements = header.findall("value[@center='True']")
-            
-            if len(value_elements) < 3:
-                logger.warning(f"Pas assez d'éléments <value center='True'> trouvés (trouvé: {len(value_elements)}, requis: 3)")
-                return False
-            
-            line1 = commerce_name.upper() if commerce_name else ""
-            line2 = f"{address_num} {address_street}".strip().upper()
-            line3 = f"{city}, QUEBEC, {postal_code}".upper()
-            
-            value_elements[0].set("text", line1)
-            value_elements[1].set("text", line2)
-            value_elements[2].set("text", line3)
-            
-            tree.write(layout_path, encoding="utf-8", xml_declaration=True)
-            logger.info(f"Layout header mis à jour avec succès:")
+        line1 = commerce_name.upper() if commerce_name else ""
+        line2 = f"{address_num} {address_street}".strip().upper()
+        line3 = f"{city}, QUEBEC, {postal_code}".upper()
+        lines = [line1, line2, line3]
+        
+        data = self.storage.read_bytes(layout_path)
+        patched = patch_header_values(data, lines)
+        if patched is not None:
+            if patched == data:
+                return UNCHANGED
+            logger.info(f"Layout header mis à jour :")
             logger.info(f"  Ligne 1: {line1}")
             logger.info(f"  Ligne 2: {line2}")
             logger.info(f"  Ligne 3: {line3}")
-            return True
+            return lambda f: f.write(patched)
         
-        except Exception as e:
-            logger.error(f"Erreur lors de la mise à jour du layout header : {e}")
-            return False
+        logger.info("Structure inattendue dans layout.xml, passage par ElementTree")
+        content = self._read_document(layout_path).text
+        root = ET.fromstring(content)
+        
+        header = root.find("Header")
+        if header is None:
+            logger.warning("Élément <Header> non trouvé dans layout.xml")
+            return None
+        
+        value_elements = header.findall("value[@center='True']")
+        
+        if len(value_elements) < 3:
+            logger.warning(f"Pas assez d'éléments <value center='True'> trouvés (trouvé: {len(value_elements)}, requis: 3)")
+            return None
+        
+        if [e.get("text") for e in value_elements[:3]] == lines:
+            return content
+        
+        for element, line in zip(value_elements, lines):
+            element.set("text", line)
+        
+        logger.info(f"Layout header mis à jour :")
+        logger.info(f"  Ligne 1: {line1}")
+        logger.info(f"  Ligne 2: {line2}")
+        logger.info(f"  Ligne 3: {line3}")
+        return canonical_xml(root)
+
+    def update_layout_header(self, commerce_name: str, address_num: str, address_street: str, 
+                            city: str, postal_code: str) -> bool:
+        status = self._save_document(self.layout_path, lambda: self._render_layout_header(
+            commerce_name, address_num, address_street, city, postal_code))
+        return status != FAILED
     
-    def ensure_receipt_printer_in_menu(self) -> bool:
-        if not os.path.exists(self.menu_path):
+    def _render_receipt_printer(self):
+        if not self._exists(self.menu_path):
             logger.warning(f"Fichier menu.xml introuvable : {self.menu_path}")
-            return False
+            return None
         
+        opener = self.storage.open_read
+        if menu_editor.find_bytes(self.menu_path, b'<Printer Name="Receipt"', opener=opener) >= 0:
+            logger.info("Ligne Receipt Printer déjà présente dans menu.xml")
+            return UNCHANGED
+        
+        marker = b'<PRINTERS Text="PRINTERS">'
+        offset = menu_editor.find_bytes(self.menu_path, marker, opener=opener)
+        if offset < 0:
+            logger.warning("Section <PRINTERS Text=\"PRINTERS\"> non trouvée dans menu.xml")
+            return None
+        
+        newline = menu_editor.detect_newline(self.menu_path, opener=opener)
+        logger.info("Ligne Receipt Printer ajoutée dans menu.xml")
+        return menu_editor.splice_writer(
+            self.menu_path, offset + len(marker),
+            newline + b"\t\t" + RECEIPT_PRINTER_LINE.encode("utf-8"),
+            opener=opener
+        )
+
+    def snapshot_store(self) -> Optional[SnapshotStore]:
+        folder = self.storage.local_path(os.path.dirname(self.config_path) or ".")
+        return SnapshotStore(folder) if folder is not None else None
+
+    def publish_manifest(self) -> Optional[Dict]:
+        """Signature de menu.xml, manifeste et archive pour les stations ; peut tourner hors du
+        thread Tk, deux publications ne se chevauchent jamais."""
         try:
-            with open(self.menu_path, 'r', encoding="utf-8") as f:
-                content = f.read()
-            
-            if '<Printer Name="Receipt"' in content:
-                logger.info("Ligne Receipt Printer déjà présente dans menu.xml")
-                return True
-            
-            printer_line = '<Printer Name="Receipt" DriverName="Receipt" MEV="1" Full_Size="0" Label="0" RAW="0" Catch_All="0" Print_Tables="1" Print_Counter="1" Print_Pickup="1" Print_Delivery="1" list_Events="|Receipt,Reports|" list_Categories="" list_Items="" list_Options="" list_Choices="" IP="" Port="" Auto_Remove_Tickets="0" />'
-            
-            if '<PRINTERS Text="PRINTERS">' in content:
-                content = content.replace(
-                    '<PRINTERS Text="PRINTERS">',
-                    f'<PRINTERS Text="PRINTERS">\n\t\t{printer_line}'
-                )
-                
-                with open(self.menu_path, 'w', encoding="utf-8") as f:
-                    f.write(content)
-                
-                logger.info("Ligne Receipt Printer ajoutée dans menu.xml avec succès")
-                return True
-            else:
-                logger.warning("Section <PRINTERS Text=\"PRINTERS\"> non trouvée dans menu.xml")
-                return False
+            with self._publish_lock:
+                delta_sync.publish_signature(self.storage, self.menu_path)
+                return xml_manifest.publish_manifest(self.storage, os.path.dirname(self.config_path))
+        except Exception as e:
+            logger.error(f"Impossible de publier le manifeste : {e}")
+            return None
+
+    def menu_index(self) -> MenuIndex:
+        path = self.storage.local_path(self.menu_path)
+        if path is None:
+            raise ValueError(f"Index de menu.xml indisponible pour {self.storage!r}")
+        return MenuIndex(path).open()
+
+    def ensure_receipt_printer_in_menu(self) -> bool:
+        return self._save_document(self.menu_path, self._render_receipt_printer) != FAILED
+
+    def save_all(self, config_data: Dict[str, str], devices_data: Union[Dict[str, str], DeviceRegistry],
+                 header: Optional[Dict[str, str]] = None,
+                 ensure_receipt_printer: bool = True, publish: bool = True) -> Dict[str, str]:
+        steps = [
+            ("config.xml", self.config_path, lambda: self._render_config(config_data)),
+            ("devices.xml", self.devices_path, lambda: self._render_devices(devices_data)),
+        ]
+        if header is not None:
+            steps.append(("layout.xml", self.layout_path, lambda: self._render_layout_header(**header)))
+        if ensure_receipt_printer:
+            steps.append(("menu.xml", self.menu_path, self._render_receipt_printer))
+        
+        report = {}
+        transaction = XMLTransaction(self.documents, self.storage)
+        for name, path, render in steps:
+            status, content = self._prepare_document(path, render)
+            report[name] = status
+            if content is not None:
+                transaction.add(path, content)
+        
+        if self.auto_snapshot and transaction.paths:
+            store = self.snapshot_store()
+            if store is not None:
+                self.last_snapshot = store.auto_snapshot("save_all")
         
+        try:
+            transaction.commit()
+            if self.config_path in transaction.paths:
+                self._refresh_config_sidecar()
+            if publish and transaction.paths:
+                self.publish_manifest()
         except Exception as e:
-            logger.error(f"Erreur lors de la mise à jour de menu.xml : {e}")
-            return False
+            logger.error(f"Transaction annulée, fichiers restaurés : {e}")
+            for name, path, _ in steps:
+                if path in transaction.paths:
+                    report[name] = FAILED
+        self.last_commit_timings = dict(transaction.timings)
+        
+        if report["config.xml"] != FAILED:
+            self._remember_values(self.config_path, config_data)
+        if report["devices.xml"] != FAILED:
+            self._remember_devices(devices_data)
+        
+        logger.info(f"Rapport de sauvegarde : {report}")
+        return report
+
+    def save_model(self, model: POSConfig, header: Optional[Dict[str, str]] = None,
+                   ensure_receipt_printer: bool = True, publish: bool = True) -> Dict[str, str]:
+        return self.save_all(model.to_config_map(), model.to_devices_map(), header=header,
+                             ensure_receipt_printer=ensure_receipt_printer, publish=publish)
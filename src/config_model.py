@@ -0,0 +1,273 @@
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from validators import DataValidator
+
+
+def _bool_field(xml: str, default: bool):
+    return field(default=default, metadata={"xml": xml, "type": bool})
+
+
+def _int_field(xml: str, default: int):
+    return field(default=default, metadata={"xml": xml, "type": int})
+
+
+def _str_field(xml: str, default: str = "", validator: Optional[Callable[[str], Tuple[bool, str]]] = None):
+    return field(default=default, metadata={"xml": xml, "type": str, "validator": validator})
+
+
+@dataclass(slots=True)
+class GeneralConfig:
+    auto_logout: bool = _bool_field("Auto_Logout", False)
+    debut_print: bool = _bool_field("Debut_Print", False)
+    auto_print: bool = _bool_field("Auto_Print", False)
+
+
+@dataclass(slots=True)
+class AppearanceConfig:
+    dark_mode: bool = _bool_field("GUI_Dark_Mode", True)
+    font_size: int = _int_field("GUI_Font_Size", 12)
+    list_height: int = _int_field("GUI_List_Height", 30)
+
+
+@dataclass(slots=True)
+class ServerConfig:
+    database: str = _str_field("Database")
+    server: str = _str_field("Server")
+    replication: bool = _bool_field("Replication", False)
+
+
+@dataclass(slots=True)
+class OrderModesConfig:
+    use_floorplan: bool = _bool_field("Use_Floorplan", True)
+    use_retail: bool = _bool_field("Use_Retail", True)
+    use_counter: bool = _bool_field("Use_Counter", True)
+    use_pickup: bool = _bool_field("Use_Pickup", True)
+    use_delivery: bool = _bool_field("Use_Delivery", True)
+
+
+@dataclass(slots=True)
+class MEVConfig:
+    user_name: str = _str_field("MEV_UserName")
+    gst: str = _str_field("MEV_Gst", validator=lambda v: DataValidator.validate_tax_number(v, "TPS"))
+    qst: str = _str_field("MEV_Qst", validator=lambda v: DataValidator.validate_tax_number(v, "TVQ"))
+    auth_code: str = _str_field("MEV_Auth_Code")
+    file_number: str = _str_field("MEV_File_Number", validator=DataValidator.validate_establishment_number)
+    address: str = _str_field("MEV_Address")
+    zip: str = _str_field("MEV_Zip", validator=DataValidator.validate_postal_code)
+    sector: str = _str_field("MEV_Sector", "RES", validator=DataValidator.validate_mev_sector)
+    commerce_name: str = _str_field("MEV_Commerce_Name")
+
+
+@dataclass(slots=True)
+class DevicesConfig:
+    ip: str = _str_field("ip", validator=DataValidator.validate_ip_address)
+    com: str = _str_field("com")
+    baud: int = _int_field("baud", 9600)
+    protocol: str = _str_field("protocol", "Web Network Printer")
+
+
+CONFIG_SECTIONS = {
+    "general": GeneralConfig,
+    "appearance": AppearanceConfig,
+    "server": ServerConfig,
+    "order_modes": OrderModesConfig,
+    "mev": MEVConfig,
+}
+DEVICES_SECTIONS = {
+    "devices": DevicesConfig,
+}
+
+
+def _decode_bool(value: str, default: bool) -> bool:
+    return value == "1" if value else default
+
+
+def _decode_int(value: str, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _decode_str(value: str, default: str) -> str:
+    return value if value is not None else default
+
+
+_DECODERS = {bool: _decode_bool, int: _decode_int, str: _decode_str}
+_ENCODERS = {bool: lambda v: "1" if v else "0", int: str, str: str}
+
+
+class FieldSpec:
+    __slots__ = ("section", "name", "xml", "default", "decode", "encode", "validator")
+
+    def __init__(self, section: str, name: str, xml: str, default: Any, kind: type,
+                 validator: Optional[Callable[[str], Tuple[bool, str]]]):
+        self.section = section
+        self.name = name
+        self.xml = xml
+        self.default = default
+        self.decode = _DECODERS[kind]
+        self.encode = _ENCODERS[kind]
+        self.validator = validator
+
+
+def _compile(sections: Dict[str, type]) -> Tuple[FieldSpec, ...]:
+    return tuple(
+        FieldSpec(section, f.name, f.metadata["xml"], f.default, f.metadata["type"], f.metadata.get("validator"))
+        for section, cls in sections.items()
+        for f in fields(cls)
+    )
+
+
+CONFIG_SCHEMA = _compile(CONFIG_SECTIONS)
+DEVICES_SCHEMA = _compile(DEVICES_SECTIONS)
+SCHEMA_BY_XML = {spec.xml: spec for spec in CONFIG_SCHEMA + DEVICES_SCHEMA}
+
+CONFIG_KEYS = [spec.xml for spec in CONFIG_SCHEMA]
+DEVICES_KEYS = [spec.xml for spec in DEVICES_SCHEMA]
+CONFIG_DEFAULTS = {spec.xml: spec.encode(spec.default) for spec in CONFIG_SCHEMA}
+DEVICES_DEFAULTS = {spec.xml: spec.encode(spec.default) for spec in DEVICES_SCHEMA}
+
+
+@dataclass(slots=True)
+class POSConfig:
+    general: GeneralConfig = field(default_factory=GeneralConfig)
+    appearance: AppearanceConfig = field(default_factory=AppearanceConfig)
+    server: ServerConfig = field(default_factory=ServerConfig)
+    order_modes: OrderModesConfig = field(default_factory=OrderModesConfig)
+    mev: MEVConfig = field(default_factory=MEVConfig)
+    devices: DevicesConfig = field(default_factory=DevicesConfig)
+
+    @classmethod
+    def from_maps(cls, config: Dict[str, str], devices: Optional[Dict[str, str]] = None) -> "POSConfig":
+        model = cls()
+        for schema, values in ((CONFIG_SCHEMA, config), (DEVICES_SCHEMA, devices or {})):
+            for spec in schema:
+                raw = values.get(spec.xml)
+                if raw is not None:
+                    setattr(getattr(model, spec.section), spec.name, spec.decode(raw, spec.default))
+        return model
+
+    def _to_map(self, schema: Tuple[FieldSpec, ...]) -> Dict[str, str]:
+        return {spec.xml: spec.encode(getattr(getattr(self, spec.section), spec.name)) for spec in schema}
+
+    def to_config_map(self) -> Dict[str, str]:
+        return self._to_map(CONFIG_SCHEMA)
+
+    def to_devices_map(self) -> Dict[str, str]:
+        return self._to_map(DEVICES_SCHEMA)
+
+    def value(self, xml_key: str) -> Any:
+        spec = SCHEMA_BY_XML[xml_key]
+        return getattr(getattr(self, spec.section), spec.name)
+
+    def set_value(self, xml_key: str, value: Any):
+        spec = SCHEMA_BY_XML[xml_key]
+        if isinstance(value, str) and not isinstance(spec.default, str):
+            value = spec.decode(value, spec.default)
+        setattr(getattr(self, spec.section), spec.name, value)
+
+    def validate(self, keys: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        errors = []
+        for spec in CONFIG_SCHEMA + DEVICES_SCHEMA:
+            if spec.validator is None or (keys is not None and spec.xml not in keys):
+                continue
+            value = getattr(getattr(self, spec.section), spec.name)
+            if not value:
+                continue
+            is_valid, message = spec.validator(value)
+            if not is_valid:
+                errors.append((spec.xml, message))
+        return errors
+
+
+PRIMARY_DEVICE = "Receipt"
+DEVICE_TAG = "Device"
+
+
+@dataclass(slots=True)
+class Device(DevicesConfig):
+    name: str = PRIMARY_DEVICE
+    extra: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_attributes(cls, name: str, attrs: Dict[str, str]) -> "Device":
+        device = cls(name=name)
+        for spec in DEVICES_SCHEMA:
+            raw = attrs.get(spec.xml)
+            if raw is not None:
+                setattr(device, spec.name, spec.decode(raw, spec.default))
+        device.extra = {k: v for k, v in attrs.items() if k not in SCHEMA_BY_XML and k != "name"}
+        return device
+
+    def to_attributes(self) -> Dict[str, str]:
+        attrs = {spec.xml: spec.encode(getattr(self, spec.name)) for spec in DEVICES_SCHEMA}
+        attrs.update(self.extra)
+        return attrs
+
+
+class DeviceRegistry:
+    """Appareils nommés de devices.xml (imprimantes cuisine, bar, reçu, afficheur client).
+    La racine <Devices> garde les attributs de l'appareil principal pour rester lisible
+    par les installations qui ne connaissent que le format à un seul appareil."""
+
+    __slots__ = ("devices", "attributes")
+
+    def __init__(self, devices: Optional[List[Device]] = None, attributes: Optional[Dict[str, str]] = None):
+        self.devices: Dict[str, Device] = {}
+        self.attributes = attributes if attributes is not None else {}
+        for device in devices or []:
+            self.set(device)
+
+    @classmethod
+    def from_element(cls, root: ET.Element) -> "DeviceRegistry":
+        children = root.findall(DEVICE_TAG)
+        registry = cls(attributes={k: v for k, v in root.attrib.items() if k not in SCHEMA_BY_XML})
+        if not children:
+            registry.set(Device.from_attributes(PRIMARY_DEVICE, root.attrib))
+            registry.attributes = {}
+        for child in children:
+            registry.set(Device.from_attributes(child.get("name", ""), child.attrib))
+        return registry
+
+    @classmethod
+    def from_text(cls, content: str) -> "DeviceRegistry":
+        return cls.from_element(ET.fromstring(content))
+
+    @property
+    def primary(self) -> Optional[Device]:
+        device = self.devices.get(PRIMARY_DEVICE)
+        if device is None and self.devices:
+            device = next(iter(self.devices.values()))
+        return device
+
+    def get(self, name: str) -> Optional[Device]:
+        return self.devices.get(name)
+
+    def set(self, device: Device):
+        self.devices[device.name] = device
+
+    def remove(self, name: str) -> Optional[Device]:
+        return self.devices.pop(name, None)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.devices
+
+    def __iter__(self) -> Iterator[Device]:
+        return iter(self.devices.values())
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def to_element(self) -> ET.Element:
+        primary = self.primary
+        attrs = primary.to_attributes() if primary is not None else dict(DEVICES_DEFAULTS)
+        if primary is not None and len(self.devices) == 1 and primary.name == PRIMARY_DEVICE:
+            return ET.Element("Devices", attrs)
+        attrs.update(self.attributes)
+        root = ET.Element("Devices", attrs)
+        for device in self.devices.values():
+            ET.SubElement(root, DEVICE_TAG, {"name": device.name, **device.to_attributes()})
+        return root
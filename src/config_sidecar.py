@@ -0,0 +1,77 @@
+import struct
+from typing import Dict, Optional, Tuple
+
+from storage import new_digest
+
+MAGIC = b"TAMC"
+VERSION = 1
+SUFFIX = ".cache"
+
+_HEADER = struct.Struct("<4sBQQ20sI")
+_KEY_LEN = struct.Struct("<H")
+_VALUE_LEN = struct.Struct("<I")
+
+
+def sidecar_path(path: str) -> str:
+    return path + SUFFIX
+
+
+def source_digest(data: bytes) -> bytes:
+    digest = new_digest()
+    digest.update(data)
+    return digest.digest()
+
+
+def _pack_map(values: Dict[str, str]) -> bytes:
+    parts = [_VALUE_LEN.pack(len(values))]
+    for key, value in values.items():
+        k = key.encode("utf-8")
+        v = value.encode("utf-8")
+        parts.append(_KEY_LEN.pack(len(k)) + k + _VALUE_LEN.pack(len(v)) + v)
+    return b"".join(parts)
+
+
+def _unpack_map(data: bytes, offset: int) -> Tuple[Dict[str, str], int]:
+    (count,) = _VALUE_LEN.unpack_from(data, offset)
+    offset += _VALUE_LEN.size
+    values = {}
+    for _ in range(count):
+        (klen,) = _KEY_LEN.unpack_from(data, offset)
+        offset += _KEY_LEN.size
+        key = data[offset:offset + klen].decode("utf-8")
+        offset += klen
+        (vlen,) = _VALUE_LEN.unpack_from(data, offset)
+        offset += _VALUE_LEN.size
+        values[key] = data[offset:offset + vlen].decode("utf-8")
+        offset += vlen
+    return values, offset
+
+
+class ConfigSidecar:
+    def __init__(self, stamp: Tuple[int, int], digest: bytes, root_tag: str,
+                 root: Dict[str, str], extra: Dict[str, str]):
+        self.stamp = stamp
+        self.digest = digest
+        self.root_tag = root_tag
+        self.root = root
+        self.extra = extra
+
+    def to_bytes(self) -> bytes:
+        tag = self.root_tag.encode("utf-8")
+        header = _HEADER.pack(MAGIC, VERSION, self.stamp[0], self.stamp[1], self.digest, len(tag))
+        return header + tag + _pack_map(self.root) + _pack_map(self.extra)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["ConfigSidecar"]:
+        try:
+            magic, version, mtime_ns, size, digest, tag_len = _HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != VERSION:
+                return None
+            offset = _HEADER.size
+            root_tag = data[offset:offset + tag_len].decode("utf-8")
+            root, offset = _unpack_map(data, offset + tag_len)
+            extra, offset = _unpack_map(data, offset)
+        except (struct.error, UnicodeDecodeError):
+            return None
+        return cls((mtime_ns, size), digest, root_tag, root, extra)
+
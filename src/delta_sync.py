@@ -0,0 +1,244 @@
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import zlib
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from storage import Opener, StorageBackend, new_digest, open_binary
+
+logger = logging.getLogger(__name__)
+
+DELTA_FILES = ["menu.xml"]
+SIGNATURE_SUFFIX = ".sig"
+SIGNATURE_MAGIC = b"TSIG"
+SIGNATURE_VERSION = 1
+MIN_BLOCK_SIZE = 2 * 1024
+MAX_BLOCK_SIZE = 64 * 1024
+ADLER_MOD = 65521
+MAX_ROLL = 2 * 1024 * 1024
+FETCH_CHUNK_SIZE = 256 * 1024
+
+_HEADER = struct.Struct("<4sBIQQ20sI")
+_BLOCK = struct.Struct("<I16s")
+
+
+class DeltaError(Exception):
+    pass
+
+
+def block_size_for(size: int) -> int:
+    """Racine carrée de la taille, arrondie au Ko, comme rsync : peu de blocs pour un gros menu,
+    des blocs fins pour un petit."""
+    size_kb = math.ceil(math.sqrt(max(size, 1)) / 1024)
+    return min(MAX_BLOCK_SIZE, max(MIN_BLOCK_SIZE, size_kb * 1024))
+
+
+def strong_checksum(data) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class Signature(NamedTuple):
+    """Signature d'un fichier du serveur : Adler-32 (faible, glissante) et BLAKE2 (forte) de
+    chaque bloc, plus l'empreinte du fichier entier (la même que celle du manifeste)."""
+    block_size: int
+    mtime_ns: int
+    size: int
+    digest: bytes
+    blocks: List[Tuple[int, bytes]]
+
+    def block_length(self, index: int) -> int:
+        return min(self.block_size, self.size - index * self.block_size)
+
+    def encode(self) -> bytes:
+        header = _HEADER.pack(SIGNATURE_MAGIC, SIGNATURE_VERSION, self.block_size, self.mtime_ns,
+                              self.size, self.digest, len(self.blocks))
+        return header + b"".join(_BLOCK.pack(weak, strong) for weak, strong in self.blocks)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Signature":
+        if len(data) < _HEADER.size:
+            raise ValueError("signature tronquée")
+        magic, version, block_size, mtime_ns, size, digest, count = _HEADER.unpack_from(data)
+        if magic != SIGNATURE_MAGIC or version != SIGNATURE_VERSION:
+            raise ValueError(f"signature non prise en charge ({magic!r} v{version})")
+        if len(data) != _HEADER.size + count * _BLOCK.size or count != math.ceil(size / block_size):
+            raise ValueError("signature tronquée")
+        blocks = [_BLOCK.unpack_from(data, _HEADER.size + i * _BLOCK.size) for i in range(count)]
+        return cls(block_size, mtime_ns, size, digest, blocks)
+
+
+def compute_signature(f: BinaryIO, size: int, mtime_ns: int, block_size: Optional[int] = None) -> Signature:
+    block_size = block_size or block_size_for(size)
+    digest = new_digest()
+    blocks = []
+    for block in iter(lambda: f.read(block_size), b""):
+        digest.update(block)
+        blocks.append((zlib.adler32(block), strong_checksum(block)))
+    return Signature(block_size, mtime_ns, size, digest.digest(), blocks)
+
+
+def signature_path(path: str) -> str:
+    return path + SIGNATURE_SUFFIX
+
+
+def publish_signature(storage: StorageBackend, path: str) -> Optional[Signature]:
+    """Écrit ``<fichier>.sig`` à côté du fichier ; ne recalcule rien si la signature existante
+    porte déjà le (mtime_ns, taille) du fichier."""
+    if not storage.exists(path):
+        return None
+    mtime_ns, size = storage.stamp(path)
+    sig_path = signature_path(path)
+    if storage.exists(sig_path):
+        with storage.open_read(sig_path) as f:
+            header = f.read(_HEADER.size)
+        if len(header) == _HEADER.size:
+            _, version, _, known_mtime, known_size, _, _ = _HEADER.unpack(header)
+            if version == SIGNATURE_VERSION and (known_mtime, known_size) == (mtime_ns, size):
+                return None
+    with storage.open_read(path) as f:
+        signature = compute_signature(f, size, mtime_ns)
+    storage.write_bytes(sig_path, signature.encode())
+    logger.info(f"Signature publiée : {sig_path} ({len(signature.blocks)} blocs de {signature.block_size} o)")
+    return signature
+
+
+def read_signature(path: str, opener: Opener = open_binary) -> Optional[Signature]:
+    try:
+        with opener(signature_path(path)) as f:
+            return Signature.decode(f.read())
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning(f"Signature de {path} ignorée : {e}")
+        return None
+
+
+def match_blocks(local, signature: Signature, max_roll: int = MAX_ROLL) -> Dict[int, int]:
+    """Blocs du fichier du serveur déjà présents dans ``local`` : index du bloc → position locale.
+
+    Adler-32 est calculé en C sur chaque fenêtre alignée ; après un bloc non reconnu la fenêtre
+    glisse d'un octet à la fois (mise à jour roulante en O(1)) jusqu'à retrouver un bloc connu.
+    Au-delà de ``max_roll`` octets glissés, la recherche ne teste plus que les fenêtres alignées."""
+    size = signature.block_size
+    table: Dict[int, Dict[bytes, List[int]]] = {}
+    for index, (weak, strong) in enumerate(signature.blocks):
+        if signature.block_length(index) == size:
+            table.setdefault(weak, {}).setdefault(strong, []).append(index)
+
+    matches: Dict[int, int] = {}
+    end = len(local)
+    if end < size or not table:
+        return matches
+
+    pos = 0
+    rolled = 0
+    weak = zlib.adler32(local[0:size])
+    a, b = weak & 0xffff, weak >> 16
+    while True:
+        candidates = table.get((b << 16) | a)
+        if candidates is not None:
+            found = candidates.get(strong_checksum(local[pos:pos + size]))
+            if found:
+                for index in found:
+                    matches.setdefault(index, pos)
+                pos += size
+                if pos + size > end:
+                    break
+                weak = zlib.adler32(local[pos:pos + size])
+                a, b = weak & 0xffff, weak >> 16
+                continue
+
+        if rolled >= max_roll:
+            pos += size
+            if pos + size > end:
+                break
+            weak = zlib.adler32(local[pos:pos + size])
+            a, b = weak & 0xffff, weak >> 16
+            continue
+        if pos + size >= end:
+            break
+        out, new = local[pos], local[pos + size]
+        a = (a - out + new) % ADLER_MOD
+        b = (b - size * out + a - 1) % ADLER_MOD
+        pos += 1
+        rolled += 1
+    return matches
+
+
+def _runs(signature: Signature, matches: Dict[int, int]) -> Iterator[Tuple[bool, int, int]]:
+    """Plages consécutives à copier : (locale ?, position source, longueur)."""
+    index = 0
+    count = len(signature.blocks)
+    while index < count:
+        if index in matches:
+            start = matches[index]
+            length = signature.block_length(index)
+            index += 1
+            while index in matches and matches[index] == start + length:
+                length += signature.block_length(index)
+                index += 1
+            yield True, start, length
+        else:
+            first = index
+            while index < count and index not in matches:
+                index += 1
+            yield False, first * signature.block_size, min(index * signature.block_size, signature.size) - first * signature.block_size
+
+
+def apply_delta(local, signature: Signature, matches: Dict[int, int], remote: BinaryIO, out: BinaryIO,
+                check: Optional[Callable[[], None]] = None,
+                progress: Optional[Callable[[int], None]] = None) -> int:
+    """Reconstruit le fichier du serveur dans ``out`` et vérifie son empreinte ; retourne le
+    nombre d'octets lus sur ``remote``."""
+    digest = new_digest()
+    fetched = 0
+    written = 0
+    for is_local, start, length in _runs(signature, matches):
+        if check is not None:
+            check()
+        if is_local:
+            data = local[start:start + length]
+            out.write(data)
+            digest.update(data)
+            written += length
+        else:
+            remote.seek(start)
+            remaining = length
+            while remaining:
+                if check is not None:
+                    check()
+                data = remote.read(min(FETCH_CHUNK_SIZE, remaining))
+                if not data:
+                    raise DeltaError(f"fichier du serveur plus court que sa signature ({start + length - remaining} o)")
+                out.write(data)
+                digest.update(data)
+                remaining -= len(data)
+                fetched += len(data)
+                written += len(data)
+                if progress is not None:
+                    progress(written)
+        if progress is not None:
+            progress(written)
+    if digest.digest() != signature.digest:
+        raise DeltaError("empreinte du fichier reconstruit différente de la signature")
+    return fetched
+
+
+def delta_copy(remote_path: str, local_path: str, out_path: str, signature: Signature,
+               opener: Opener = open_binary, check: Optional[Callable[[], None]] = None,
+               progress: Optional[Callable[[int], None]] = None) -> Tuple[int, int]:
+    """Écrit dans ``out_path`` la version du serveur en réutilisant les blocs de ``local_path`` ;
+    retourne (octets transférés, octets réutilisés)."""
+    with open(local_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise DeltaError("copie locale vide")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as local:
+            matches = match_blocks(local, signature)
+            with opener(remote_path) as remote, open(out_path, 'wb') as out:
+                fetched = apply_delta(local, signature, matches, remote, out, check, progress)
+                out.flush()
+                os.fsync(out.fileno())
+    return fetched, signature.size - fetched
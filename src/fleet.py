@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from config_manager import XMLConfigManager, XMLDocumentCache, FAILED
+from storage import FileSystemStorage, MemoryStorage
+from validators import DataValidator
+
+logger = logging.getLogger(__name__)
+
+CSV_FIELDS = ("hostname", "server_ip", "printer_ip", "printer_com", "font_size", "list_height")
+FONT_SIZES = range(10, 17)
+LIST_HEIGHTS = range(25, 71, 5)
+GENERATED_FILES = ("config.xml", "devices.xml")
+
+_template: Dict[str, bytes] = {}
+
+
+def load_template(directory: str) -> Dict[str, bytes]:
+    files = {}
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.lower().endswith(".xml"):
+            with open(entry.path, 'rb') as f:
+                files[entry.name] = f.read()
+    if "config.xml" not in files:
+        raise FileNotFoundError(f"config.xml introuvable dans le modèle : {directory}")
+    return files
+
+
+def read_stations(path: str) -> List[Dict[str, str]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in ("hostname", "server_ip") if name not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Colonnes manquantes dans {path} : {', '.join(missing)}")
+        return [{name: (row.get(name) or "").strip() for name in CSV_FIELDS} for row in reader]
+
+
+def validate_station(row: Dict[str, str]) -> List[str]:
+    errors = []
+    for field, check in (("hostname", DataValidator.validate_hostname),
+                         ("server_ip", DataValidator.validate_ip_address)):
+        is_valid, message = check(row[field])
+        if not is_valid:
+            errors.append(f"{field} : {message}")
+    if row["printer_ip"]:
+        is_valid, message = DataValidator.validate_ip_address(row["printer_ip"])
+        if not is_valid:
+            errors.append(f"printer_ip : {message}")
+    elif row["printer_com"] and not row["printer_com"].upper().startswith("COM"):
+        errors.append(f"printer_com : port COM invalide ({row['printer_com']})")
+    for field, allowed in (("font_size", FONT_SIZES), ("list_height", LIST_HEIGHTS)):
+        value = row[field]
+        if value and (not value.isdigit() or int(value) not in allowed):
+            errors.append(f"{field} : valeur hors limites ({value})")
+    return errors
+
+
+def _init_worker(template: Dict[str, bytes]):
+    global _template
+    _template = template
+
+
+def render_station(row: Dict[str, str], template: Optional[Dict[str, bytes]] = None
+                   ) -> Tuple[Dict[str, str], List[str], Dict[str, bytes]]:
+    errors = validate_station(row)
+    if errors:
+        return row, errors, {}
+
+    storage = MemoryStorage(template if template is not None else _template)
+    manager = XMLConfigManager(storage=storage, documents=XMLDocumentCache())
+    model = manager.load_model()
+    model.server.server = row["server_ip"]
+    model.server.database = row["server_ip"]
+    if row["font_size"]:
+        model.set_value("GUI_Font_Size", row["font_size"])
+    if row["list_height"]:
+        model.set_value("GUI_List_Height", row["list_height"])
+    if row["printer_ip"] or row["printer_com"]:
+        model.devices.ip = row["printer_ip"]
+        model.devices.com = row["printer_com"]
+        model.devices.protocol = "Web Network Printer" if row["printer_ip"] else "Web"
+
+    errors = [f"{key} : {message}" for key, message in model.validate()]
+    if errors:
+        return row, errors, {}
+
+    report = manager.save_model(model, publish=False)
+    failed = [name for name, status in report.items() if status == FAILED and name in GENERATED_FILES]
+    if failed:
+        return row, [f"{name} : échec du rendu" for name in failed], {}
+
+    names = set(template if template is not None else _template) | set(GENERATED_FILES)
+    return row, [], {name: storage.read_bytes(storage.path(name)) for name in sorted(names)}
+
+
+def write_station(output: str, hostname: str, files: Dict[str, bytes]):
+    target = FileSystemStorage(os.path.join(output, hostname))
+    for name, data in files.items():
+        target.write_bytes(target.path(name), data)
+
+
+def generate(template_dir: str, stations_csv: str, output: str, workers: Optional[int] = None) -> Dict:
+    template = load_template(template_dir)
+    rows = read_stations(stations_csv)
+
+    results: Dict[str, Dict] = {}
+    pending = []
+    seen = set()
+    for row in rows:
+        hostname = row["hostname"]
+        if hostname.lower() in seen:
+            results[f"{hostname} (ligne dupliquée)"] = {"status": "invalid", "errors": ["hostname : doublon"]}
+            continue
+        seen.add(hostname.lower())
+        pending.append(row)
+
+    start = time.perf_counter()
+    if workers == 1:
+        rendered = (render_station(row, template) for row in pending)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template,))
+        chunksize = max(1, len(pending) // (4 * (workers or os.cpu_count() or 1)))
+        rendered = executor.map(render_station, pending, chunksize=chunksize)
+    try:
+        for row, errors, files in rendered:
+            hostname = row["hostname"]
+            if errors:
+                results[hostname] = {"status": "invalid", "errors": errors}
+                continue
+            try:
+                write_station(output, hostname, files)
+                results[hostname] = {"status": "ok", "files": sorted(files)}
+            except OSError as e:
+                results[hostname] = {"status": "failed", "errors": [str(e)]}
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    generated = sum(1 for result in results.values() if result["status"] == "ok")
+    return {
+        "stations": results,
+        "generated": generated,
+        "rejected": len(results) - generated,
+        "seconds": elapsed,
+        "stations_per_second": generated / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Génère les dossiers xml de toutes les stations d'une succursale")
+    parser.add_argument("template", help="Dossier modèle (config.xml, devices.xml, layout.xml, menu.xml...)")
+    parser.add_argument("stations", help=f"CSV des stations ({', '.join(CSV_FIELDS)})")
+    parser.add_argument("output", help="Dossier de sortie, un sous-dossier par station")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    summary = generate(args.template, args.stations, args.output, args.workers)
+
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        for hostname, result in summary["stations"].items():
+            if result["status"] == "ok":
+                print(f"✅ {hostname}")
+            else:
+                print(f"❌ {hostname} : " + " ; ".join(result["errors"]))
+        print(f"{summary['generated']} stations générées, {summary['rejected']} rejetées "
+              f"en {summary['seconds']:.2f} s ({summary['stations_per_second']:.1f} stations/s)")
+
+    return 1 if summary["rejected"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
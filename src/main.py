@@ -7,13 +7,16 @@ import re
 import os
 import subprocess
 import threading
-from config_manager import XMLConfigManager
+import queue
+from config_manager import XMLConfigManager, WRITTEN, SKIPPED, FAILED
 from validators import DataValidator
 from utils import setup_logging, get_com_ports, can_rename_computer, rename_computer_windows
 import system_config
 
 logger = setup_logging()
 
+WATCHER_POLL_MS = 500
+
 ctk.set_appearance_mode("System")
 ctk.set_default_color_theme("blue")
 
@@ -50,14 +53,12 @@ class XMLConfigWizard(ctk.CTk):
         self.config_manager = XMLConfigManager()
         self.validator = DataValidator()
         
-        self.config_data = self.config_manager.load_config_data()
-        self.mev_data = self.config_manager.load_mev_data()
+        self.model = self.config_manager.load_model()
         
         self.is_server = False
         self.config_fields = {}
         self.mev_fields = {}
         self.config_checkboxes = {}
-        self.devices_data = self.config_manager.load_devices_data()
         self.printer_type = ctk.StringVar(value="IP")
         self.mev_address_parts = {}
         
@@ -68,6 +69,8 @@ class XMLConfigWizard(ctk.CTk):
         self.create_navigation()
         self.show_page(0)
         
+        self._start_watcher()
+        
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         logger.info("Application Tamio FS démarrée")
@@ -79,6 +82,63 @@ class XMLConfigWizard(ctk.CTk):
 
 
 
+    def _start_watcher(self):
+        self.watcher = self.config_manager.watcher()
+        if self.watcher is None:
+            return
+        self.watcher_events = queue.Queue()
+        self.watcher.subscribe(self.watcher_events.put)
+        self.watcher.start()
+        self.after(WATCHER_POLL_MS, self._poll_watcher)
+
+    def _poll_watcher(self):
+        while True:
+            try:
+                changes = self.watcher_events.get_nowait()
+            except queue.Empty:
+                break
+            self._on_xml_changed(changes)
+        self.after(WATCHER_POLL_MS, self._poll_watcher)
+
+    def _on_xml_changed(self, changes):
+        names = {change.name.lower() for change in changes}
+        if not names & {"config.xml", "devices.xml"}:
+            return
+        previous, self.model = self.model, self.config_manager.load_model()
+        refreshed = self._refresh_widgets(previous, self.model)
+        logger.info(f"Fichiers modifiés hors de l'assistant ({', '.join(sorted(names))}) : {refreshed} champs rafraîchis")
+
+    @staticmethod
+    def _set_widget(widget, value: str):
+        if isinstance(widget, ctk.CTkEntry):
+            widget.delete(0, "end")
+            widget.insert(0, value)
+        else:
+            widget.set(value)
+
+    def _refresh_widgets(self, previous, current) -> int:
+        """Reporte les nouvelles valeurs du disque dans les champs que l'utilisateur n'a pas touchés."""
+        refreshed = 0
+        for key, var in self.config_checkboxes.items():
+            old, new = previous.value(key), current.value(key)
+            if old != new and bool(var.get()) == old:
+                var.set(new)
+                refreshed += 1
+        
+        widgets = [(widget, str(previous.value(key)), str(current.value(key)))
+                   for key, widget in list(self.config_fields.items()) + list(self.mev_fields.items())
+                   if key != "MEV_Address"]
+        widgets += [
+            (self.ip_entry, previous.devices.ip, current.devices.ip),
+            (self.com_box, previous.devices.com, current.devices.com),
+            (self.baud_box, str(previous.devices.baud), str(current.devices.baud)),
+        ]
+        for widget, old, new in widgets:
+            if old != new and widget.get() == old:
+                self._set_widget(widget, new)
+                refreshed += 1
+        return refreshed
+
     def create_navigation(self):
         self.nav_frame = ctk.CTkFrame(self)
         self.nav_frame.pack(side="bottom", fill="x", pady=10)
@@ -189,7 +249,7 @@ class XMLConfigWizard(ctk.CTk):
         }
         
         for key, label in general_options.items():
-            var = ctk.BooleanVar(value=self.config_data.get(key, "0") == "1")
+            var = ctk.BooleanVar(value=self.model.value(key))
             ctk.CTkCheckBox(parent, text=label, variable=var).pack(anchor="w", pady=3)
             self.config_checkboxes[key] = var
 
@@ -197,13 +257,13 @@ class XMLConfigWizard(ctk.CTk):
         ctk.CTkFrame(parent, height=2, fg_color="gray25").pack(fill="x", pady=10)
         ctk.CTkLabel(parent, text="🎨 Apparence", font=("Arial", 16, "bold")).pack(anchor="w", pady=(5, 10))
         
-        dark_var = ctk.BooleanVar(value=self.config_data.get("GUI_Dark_Mode", "1") == "1")
+        dark_var = ctk.BooleanVar(value=self.model.appearance.dark_mode)
         ctk.CTkCheckBox(parent, text="Activer le mode sombre", variable=dark_var).pack(anchor="w", pady=3)
         self.config_checkboxes["GUI_Dark_Mode"] = dark_var
         
         ctk.CTkLabel(parent, text="Taille de police", font=("Arial", 12)).pack(anchor="w", pady=(10, 2))
         font_sizes = [str(x) for x in range(10, 17)]
-        current_font = self.config_data.get("GUI_Font_Size", "12") or "12"
+        current_font = str(self.model.appearance.font_size)
         font_dropdown = ctk.CTkComboBox(parent, values=font_sizes, width=100)
         font_dropdown.pack(anchor="w", pady=(0, 5))
         font_dropdown.set(current_font)
@@ -212,7 +272,7 @@ class XMLConfigWizard(ctk.CTk):
         
         ctk.CTkLabel(parent, text="Hauteur des lignes", font=("Arial", 12)).pack(anchor="w", pady=(10, 2))
         row_heights = [str(x) for x in range(25, 71, 5)]
-        current_height = self.config_data.get("GUI_List_Height", "30") or "30"
+        current_height = str(self.model.appearance.list_height)
         row_dropdown = ctk.CTkComboBox(parent, values=row_heights, width=100)
         row_dropdown.pack(anchor="w", pady=(0, 5))
         row_dropdown.set(current_height)
@@ -226,29 +286,6 @@ class XMLConfigWizard(ctk.CTk):
 
 
 
-    def decode_xml_escaped(self, text: str):
-        # Si la valeur n'est pas une string, retourne une string vide
-        if not isinstance(text, str):
-            return ""
-
-        # Convertit _x0031_ -> 1
-        return re.sub(
-            r"_x([0-9A-Fa-f]{4})_",
-            lambda m: chr(int(m.group(1), 16)),
-            text
-        )
-
-
-
-
-
-
-
-
-
-
-
-
     def _create_server_section(self, parent):
         try:
             ctk.CTkLabel(parent, text="🔗 Configuration serveur", font=("Arial", 16, "bold")).pack(anchor="w", pady=(5, 10))
@@ -263,15 +300,12 @@ class XMLConfigWizard(ctk.CTk):
                 
                 entry = ctk.CTkEntry(parent, width=250)
 
-                raw = self.config_data.get(key, "")
-                decoded = self.decode_xml_escaped(raw)
-
-                entry.insert(0, decoded)
+                entry.insert(0, self.model.value(key))
                 entry.pack(anchor="w", pady=(0, 5))
 
                 self.config_fields[key] = entry
 
-            var = ctk.BooleanVar(value=self.config_data.get("Replication", "0") == "1")
+            var = ctk.BooleanVar(value=self.model.server.replication)
             ctk.CTkCheckBox(parent, text="Activer la réplication pour toutes les stations", variable=var).pack(anchor="w", pady=5)
             self.config_checkboxes["Replication"] = var
 
@@ -306,7 +340,7 @@ class XMLConfigWizard(ctk.CTk):
         }
         
         for key, label in modes.items():
-            var = ctk.BooleanVar(value=self.config_data.get(key, "1") == "1")
+            var = ctk.BooleanVar(value=self.model.value(key))
             ctk.CTkCheckBox(parent, text=label, variable=var).pack(anchor="w", pady=3)
             self.config_checkboxes[key] = var
 
@@ -345,8 +379,7 @@ class XMLConfigWizard(ctk.CTk):
         
         for col, subset in [(left, keys[:mid]), (right, keys[mid:])]:
             for key in subset:
-                # 🔥 Décodage automatique pour tous les champs
-                value = self.decode_xml_escaped(self.mev_data.get(key, ""))
+                value = self.model.value(key)
                 
                 ctk.CTkLabel(col, text=labels[key], font=("Arial", 12)).pack(anchor="w", pady=(8, 2))
                 
@@ -360,9 +393,7 @@ class XMLConfigWizard(ctk.CTk):
                     addr_frame = ctk.CTkFrame(col)
                     addr_frame.pack(pady=(0, 5), fill="x")
 
-                    # 🔥 On utilise la valeur déjà décodée
-                    decoded_addr = value
-                    addr_parts = decoded_addr.split(",")
+                    addr_parts = value.split(",")
 
                     num   = addr_parts[0].strip() if len(addr_parts) > 0 else ""
                     rue   = addr_parts[1].strip() if len(addr_parts) > 1 else ""
@@ -432,19 +463,19 @@ class XMLConfigWizard(ctk.CTk):
         
         self.ip_label = ctk.CTkLabel(self.opt_frame, text="Adresse IP de l'imprimante :", font=("Arial", 12))
         self.ip_entry = ctk.CTkEntry(self.opt_frame, width=200)
-        current_ip = self.devices_data.get('ip', '')
+        current_ip = self.model.devices.ip
         if current_ip:
             self.ip_entry.insert(0, current_ip)
         
         self.com_label = ctk.CTkLabel(self.opt_frame, text="Port COM :", font=("Arial", 12))
         self.com_box = ctk.CTkComboBox(self.opt_frame, values=get_com_ports(), width=200)
-        current_com = self.devices_data.get('com', '')
+        current_com = self.model.devices.com
         if current_com:
             self.com_box.set(current_com)
         
         self.baud_label = ctk.CTkLabel(self.opt_frame, text="Baud Rate :", font=("Arial", 12))
         baud_rates = ["1200", "2400", "4800", "9600", "19200", "38400", "57600", "115200"]
-        current_baud = self.devices_data.get('baud', '9600')
+        current_baud = str(self.model.devices.baud)
         self.baud_box = ctk.CTkComboBox(self.opt_frame, values=baud_rates, width=200)
         self.baud_box.set(current_baud)
         logger.info(f"[SERVEUR] Baud Rate chargé: '{current_baud}'")
@@ -876,15 +907,13 @@ class XMLConfigWizard(ctk.CTk):
 
     def save_all(self):
         try:
-            data_to_save = {}
-            
             for key, widget in self.config_fields.items():
                 if isinstance(widget, (ctk.StringVar, ctk.CTkEntry, ctk.CTkComboBox)):
                     value = widget.get() if hasattr(widget, 'get') else str(widget)
-                    data_to_save[key] = value
+                    self.model.set_value(key, value)
             
             for key, var in self.config_checkboxes.items():
-                data_to_save[key] = "1" if var.get() else "0"
+                self.model.set_value(key, bool(var.get()))
             
             address_num = ""
             address_street = ""
@@ -896,68 +925,53 @@ class XMLConfigWizard(ctk.CTk):
                     num = parts["num"].get().strip()
                     rue = parts["rue"].get().strip()
                     ville = parts["ville"].get().strip()
-                    data_to_save[key] = f"{num}, {rue}, {ville}"
+                    self.model.mev.address = f"{num}, {rue}, {ville}"
                     
                     address_num = num
                     address_street = rue
                     address_city = ville
                 else:
                     value = widget.get() if hasattr(widget, 'get') else str(widget)
-                    data_to_save[key] = value
+                    self.model.set_value(key, value)
             
-            protocol_value = "Web Network Printer" if self.printer_type.get() == "IP" else "Web"
+            self.model.devices.ip = self.ip_entry.get().strip()
+            self.model.devices.com = self.com_box.get().strip()
+            self.model.set_value('baud', self.baud_box.get().strip())
+            self.model.devices.protocol = "Web Network Printer" if self.printer_type.get() == "IP" else "Web"
             
-            devices_to_save = {
-                'ip': self.ip_entry.get().strip(),
-                'com': self.com_box.get().strip(),
-                'baud': self.baud_box.get().strip(),
-                'protocol': protocol_value
+            header = {
+                "commerce_name": self.model.mev.commerce_name,
+                "address_num": address_num,
+                "address_street": address_street,
+                "city": address_city,
+                "postal_code": self.model.mev.zip
             }
             
-            config_saved = self.config_manager.save_config_data(data_to_save)
-            devices_saved = self.config_manager.save_devices_data(devices_to_save)
+            report = self.config_manager.save_model(self.model, header=header, publish=False)
+            if any(status == WRITTEN for status in report.values()):
+                threading.Thread(target=self.config_manager.publish_manifest, daemon=True).start()
             
-            if config_saved:
-                logger.info("Configuration sauvegardée dans config.xml avec succès")
-                
-                commerce_name = data_to_save.get("MEV_Commerce_Name", "")
-                postal_code = data_to_save.get("MEV_Zip", "")
-                
-                layout_updated = self.config_manager.update_layout_header(
-                    commerce_name=commerce_name,
-                    address_num=address_num,
-                    address_street=address_street,
-                    city=address_city,
-                    postal_code=postal_code
-                )
-                
-                menu_updated = self.config_manager.ensure_receipt_printer_in_menu()
-                
-                if devices_saved:
-                    logger.info(f"Devices.xml sauvegardé avec succès : IP={devices_to_save['ip']}, COM={devices_to_save['com']}, Baud={devices_to_save['baud']}")
-                
-                if layout_updated and devices_saved and menu_updated:
-                    messagebox.showinfo("Succès", "Tous les fichiers sauvegardés avec succès!\n(config.xml, devices.xml, layout.xml, menu.xml)")
-                    logger.info("Tous les fichiers mis à jour avec succès")
-                elif devices_saved:
-                    files_ok = ["config.xml", "devices.xml"]
-                    files_ko = []
-                    if not layout_updated:
-                        files_ko.append("layout.xml")
-                    if not menu_updated:
-                        files_ko.append("menu.xml")
-                    
-                    msg = f"Fichiers sauvegardés : {', '.join(files_ok)}"
-                    if files_ko:
-                        msg += f"\n\nFichiers non mis à jour : {', '.join(files_ko)}"
-                    messagebox.showinfo("Succès partiel", msg)
-                    logger.warning(f"Certains fichiers non mis à jour : {files_ko}")
-                else:
-                    messagebox.showinfo("Succès partiel", "Configuration sauvegardée mais certains fichiers XML non mis à jour.")
-                    logger.warning("Certains fichiers XML non mis à jour")
-            else:
+            written = [name for name, status in report.items() if status == WRITTEN]
+            skipped = [name for name, status in report.items() if status == SKIPPED]
+            failed = [name for name, status in report.items() if status == FAILED]
+            
+            if report["config.xml"] == FAILED:
                 messagebox.showerror("Erreur", "Échec de la sauvegarde de la configuration")
                 logger.error("Échec de la sauvegarde")
+                return
+            
+            msg = ""
+            if written:
+                msg += f"Fichiers sauvegardés : {', '.join(written)}"
+            if skipped:
+                msg += f"\n\nFichiers inchangés : {', '.join(skipped)}"
+            if failed:
+                msg += f"\n\nFichiers non mis à jour : {', '.join(failed)}"
+                messagebox.showinfo("Succès partiel", msg.strip())
+                logger.warning(f"Certains fichiers non mis à jour : {failed}")
+            else:
+                messagebox.showinfo("Succès", msg.strip() or "Aucune modification à sauvegarder")
+                logger.info("Tous les fichiers mis à jour avec succès")
         
         except Exception as e:
             logger.error(f"Erreur lors de la sauvegarde : {e}")
@@ -982,6 +996,7 @@ class XMLConfigWizard(ctk.CTk):
     
     def on_closing(self):
         logger.info("Fermeture de l'application serveur")
+        logger.info(f"Cache XML : {self.config_manager.cache_stats()}")
         self.destroy()
         sys.exit(0)
 
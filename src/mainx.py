@@ -226,29 +226,6 @@ class XMLConfigWizard(ctk.CTk):
 
 
 
-    def decode_xml_escaped(self, text: str):
-        # Si la valeur n'est pas une string, retourne une string vide
-        if not isinstance(text, str):
-            return ""
-
-        # Convertit _x0031_ -> 1
-        return re.sub(
-            r"_x([0-9A-Fa-f]{4})_",
-            lambda m: chr(int(m.group(1), 16)),
-            text
-        )
-
-
-
-
-
-
-
-
-
-
-
-
     def _create_server_section(self, parent):
         try:
             ctk.CTkLabel(parent, text="🔗 Configuration serveur", font=("Arial", 16, "bold")).pack(anchor="w", pady=(5, 10))
@@ -263,10 +240,7 @@ class XMLConfigWizard(ctk.CTk):
                 
                 entry = ctk.CTkEntry(parent, width=250)
 
-                raw = self.config_data.get(key, "")
-                decoded = self.decode_xml_escaped(raw)
-
-                entry.insert(0, decoded)
+                entry.insert(0, self.config_data.get(key, ""))
                 entry.pack(anchor="w", pady=(0, 5))
 
                 self.config_fields[key] = entry
@@ -343,7 +317,7 @@ class XMLConfigWizard(ctk.CTk):
 
         for col, subset in [(left, keys[:mid]), (right, keys[mid:])]:
             for key in subset:
-                value = self.decode_xml_escaped(self.mev_data.get(key, ""))
+                value = self.mev_data.get(key, "")
 
                 ctk.CTkLabel(col, text=labels[key], font=("Arial", 12)).pack(anchor="w", pady=(8, 2))
 
@@ -357,8 +331,7 @@ class XMLConfigWizard(ctk.CTk):
                     addr_frame = ctk.CTkFrame(col)
                     addr_frame.pack(pady=(0, 5), fill="x")
 
-                    decoded_addr = value
-                    addr_parts = decoded_addr.split(",")
+                    addr_parts = value.split(",")
 
                     num   = addr_parts[0].strip() if len(addr_parts) > 0 else ""
                     rue   = addr_parts[1].strip() if len(addr_parts) > 1 else ""
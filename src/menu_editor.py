@@ -0,0 +1,64 @@
+import io
+import mmap
+import os
+from typing import BinaryIO, Callable
+
+from storage import Opener, open_binary
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _scan(f: BinaryIO, needle: bytes, start: int) -> int:
+    f.seek(start)
+    offset = start
+    tail = b""
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            return -1
+        window = tail + chunk
+        found = window.find(needle)
+        if found >= 0:
+            return offset - len(tail) + found
+        tail = window[-(len(needle) - 1):] if len(needle) > 1 else b""
+        offset += len(chunk)
+
+
+def find_bytes(path: str, needle: bytes, start: int = 0, opener: Opener = open_binary) -> int:
+    with opener(path) as f:
+        try:
+            fileno = f.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            return _scan(f, needle, start)
+        if os.fstat(fileno).st_size == 0:
+            return -1
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(needle, start)
+
+
+def detect_newline(path: str, opener: Opener = open_binary) -> bytes:
+    with opener(path) as f:
+        head = f.read(CHUNK_SIZE)
+    return b"\r\n" if b"\r\n" in head else b"\n"
+
+
+def copy_range(src: BinaryIO, dst: BinaryIO, start: int, end: int = -1):
+    src.seek(start)
+    remaining = end - start if end >= 0 else -1
+    while remaining != 0:
+        chunk = src.read(CHUNK_SIZE if remaining < 0 else min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        dst.write(chunk)
+        if remaining > 0:
+            remaining -= len(chunk)
+
+
+def splice_writer(path: str, offset: int, insert: bytes,
+                  opener: Opener = open_binary) -> Callable[[BinaryIO], None]:
+    def write(dst: BinaryIO):
+        with opener(path) as src:
+            copy_range(src, dst, 0, offset)
+            dst.write(insert)
+            copy_range(src, dst, offset)
+    return write
@@ -0,0 +1,199 @@
+import logging
+import os
+import re
+import sqlite3
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Set, Tuple
+
+from storage import file_digest
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = "1"
+
+ROUTE_KINDS = {
+    "list_Events": "Events",
+    "list_Categories": "Categories",
+    "list_Items": "Items",
+    "list_Options": "Options",
+    "list_Choices": "Choices",
+}
+CATALOG_TAGS = {
+    "category": "Categories",
+    "item": "Items",
+    "option": "Options",
+    "choice": "Choices",
+}
+KEY_ATTRIBUTES = ("ID", "Id", "id", "Name", "Text")
+
+_ROUTE_SPLIT_RE = re.compile(r"[|,]")
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE printers (name TEXT PRIMARY KEY, driver TEXT, ip TEXT, port TEXT, catch_all INTEGER);
+CREATE TABLE routes (printer TEXT, kind TEXT, value TEXT);
+CREATE TABLE catalog (kind TEXT, key TEXT, name TEXT, parent TEXT);
+CREATE INDEX routes_by_value ON routes (kind, value);
+CREATE INDEX catalog_by_key ON catalog (kind, key);
+"""
+
+
+def decode_route_list(value: Optional[str]) -> Set[str]:
+    if not value:
+        return set()
+    return {part.strip() for part in _ROUTE_SPLIT_RE.split(value) if part.strip()}
+
+
+def _element_key(attrs: Dict[str, str]) -> str:
+    for name in KEY_ATTRIBUTES:
+        if attrs.get(name):
+            return attrs[name]
+    return ""
+
+
+def iter_menu(path: str):
+    """Parcourt menu.xml en flux et produit ("printer", attrs) ou ("catalog", kind, key, name, parent)."""
+    stack: List[ET.Element] = []
+    catalog_keys: List[Optional[str]] = []
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            tag = elem.tag.lower()
+            entry_key = None
+            if tag == "printer":
+                yield ("printer", dict(elem.attrib))
+            elif tag in CATALOG_TAGS:
+                entry_key = _element_key(elem.attrib)
+                parent = next((k for k in reversed(catalog_keys) if k), "")
+                yield ("catalog", CATALOG_TAGS[tag], entry_key,
+                       elem.get("Name") or elem.get("Text") or "", parent)
+            stack.append(elem)
+            catalog_keys.append(entry_key)
+        else:
+            stack.pop()
+            catalog_keys.pop()
+            elem.clear()
+            if stack:
+                del stack[-1][:]
+
+
+class MenuIndex:
+    def __init__(self, menu_path: str, index_path: Optional[str] = None):
+        self.menu_path = menu_path
+        self.index_path = index_path or f"{menu_path}.idx"
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _stat_key(self) -> str:
+        st = os.stat(self.menu_path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def _read_meta(self, conn: sqlite3.Connection) -> Dict[str, str]:
+        try:
+            return dict(conn.execute("SELECT key, value FROM meta"))
+        except sqlite3.DatabaseError:
+            return {}
+
+    def open(self) -> "MenuIndex":
+        if self._conn is not None:
+            return self
+        stat_key = self._stat_key()
+        if os.path.exists(self.index_path):
+            conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            meta = self._read_meta(conn)
+            if meta.get("version") == INDEX_VERSION:
+                if meta.get("stat") == stat_key:
+                    self._conn = conn
+                    return self
+                if meta.get("hash") == file_digest(self.menu_path):
+                    with conn:
+                        conn.execute("UPDATE meta SET value = ? WHERE key = 'stat'", (stat_key,))
+                    self._conn = conn
+                    return self
+            conn.close()
+        self._conn = self._build(stat_key)
+        return self
+
+    def _build(self, stat_key: str) -> sqlite3.Connection:
+        digest = file_digest(self.menu_path)
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            conn = sqlite3.connect(tmp_path)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Index menu.xml non persistant ({e}), index en mémoire")
+            tmp_path = None
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+
+        conn.executescript(_SCHEMA)
+        printers = routes = entries = 0
+        batch: List[Tuple[str, str, str, str]] = []
+        with conn:
+            for record in iter_menu(self.menu_path):
+                if record[0] == "printer":
+                    attrs = record[1]
+                    name = attrs.get("Name", "")
+                    conn.execute("INSERT OR REPLACE INTO printers VALUES (?, ?, ?, ?, ?)",
+                                 (name, attrs.get("DriverName", ""), attrs.get("IP", ""),
+                                  attrs.get("Port", ""), 1 if attrs.get("Catch_All") == "1" else 0))
+                    printers += 1
+                    for attribute, kind in ROUTE_KINDS.items():
+                        values = decode_route_list(attrs.get(attribute))
+                        conn.executemany("INSERT INTO routes VALUES (?, ?, ?)",
+                                         [(name, kind, value) for value in sorted(values)])
+                        routes += len(values)
+                else:
+                    batch.append(record[1:])
+                    entries += 1
+                    if len(batch) >= 10000:
+                        conn.executemany("INSERT INTO catalog VALUES (?, ?, ?, ?)", batch)
+                        batch.clear()
+            conn.executemany("INSERT INTO catalog VALUES (?, ?, ?, ?)", batch)
+            conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                             [("version", INDEX_VERSION), ("hash", digest), ("stat", stat_key)])
+
+        if tmp_path is not None:
+            conn.close()
+            os.replace(tmp_path, self.index_path)
+            conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        logger.info(f"Index menu.xml construit : {printers} imprimantes, {routes} routes, {entries} entrées")
+        return conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "MenuIndex":
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        self.open()
+        return self._conn.execute(sql, params).fetchall()
+
+    @property
+    def content_hash(self) -> str:
+        return self._query("SELECT value FROM meta WHERE key = 'hash'")[0][0]
+
+    def printers(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT name FROM printers ORDER BY name")]
+
+    def printer_routes(self, printer: str) -> Dict[str, Set[str]]:
+        routes: Dict[str, Set[str]] = {kind: set() for kind in ROUTE_KINDS.values()}
+        for kind, value in self._query("SELECT kind, value FROM routes WHERE printer = ?", (printer,)):
+            routes[kind].add(value)
+        return routes
+
+    def printers_for(self, kind: str, key: str) -> List[str]:
+        rows = self._query("SELECT DISTINCT printer FROM routes WHERE kind = ? AND value = ? ORDER BY printer",
+                           (kind, key))
+        return [row[0] for row in rows]
+
+    def catalog(self, kind: str) -> List[Tuple[str, str, str]]:
+        return self._query("SELECT key, name, parent FROM catalog WHERE kind = ?", (kind,))
+
+    def find_entry(self, kind: str, key: str) -> Optional[Tuple[str, str, str]]:
+        rows = self._query("SELECT key, name, parent FROM catalog WHERE kind = ? AND key = ?", (kind, key))
+        return rows[0] if rows else None
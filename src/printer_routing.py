@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+from menu_index import ROUTE_KINDS, decode_route_list, iter_menu
+
+logger = logging.getLogger(__name__)
+
+CATALOG_KINDS = ("Categories", "Items", "Options", "Choices")
+
+
+class PrinterRouting:
+    def __init__(self):
+        self.printer_routes: Dict[str, Dict[str, Set[str]]] = {}
+        self.routed_to: Dict[str, Dict[str, Set[str]]] = {kind: {} for kind in ROUTE_KINDS.values()}
+        self.catalog: Dict[str, Dict[str, Tuple[str, str]]] = {kind: {} for kind in CATALOG_KINDS}
+        self.catch_all: Set[str] = set()
+
+    @classmethod
+    def from_menu(cls, path: str) -> "PrinterRouting":
+        routing = cls()
+        for record in iter_menu(path):
+            if record[0] == "printer":
+                routing.add_printer(record[1])
+            else:
+                _, kind, key, name, parent = record
+                routing.catalog[kind][key] = (name, parent)
+        return routing
+
+    def add_printer(self, attrs: Dict[str, str]):
+        name = attrs.get("Name", "")
+        routes = {kind: decode_route_list(attrs.get(attribute)) for attribute, kind in ROUTE_KINDS.items()}
+        self.printer_routes[name] = routes
+        for kind, keys in routes.items():
+            inverse = self.routed_to[kind]
+            for key in keys:
+                inverse.setdefault(key, set()).add(name)
+        if attrs.get("Catch_All") == "1":
+            self.catch_all.add(name)
+
+    def printers_for(self, kind: str, key: str) -> Set[str]:
+        return self.routed_to.get(kind, {}).get(key, set())
+
+    def printers_for_item(self, key: str) -> Set[str]:
+        printers = set(self.printers_for("Items", key)) | self.catch_all
+        entry = self.catalog["Items"].get(key)
+        if entry is not None and entry[1]:
+            printers |= self.printers_for("Categories", entry[1])
+        return printers
+
+    def dangling_references(self) -> List[Tuple[str, str, str]]:
+        dangling = []
+        for kind in CATALOG_KINDS:
+            known = self.catalog[kind]
+            for key, printers in self.routed_to[kind].items():
+                if key not in known:
+                    dangling.extend((printer, kind, key) for printer in sorted(printers))
+        return sorted(dangling)
+
+    def unrouted_items(self) -> List[Tuple[str, str]]:
+        if self.catch_all:
+            return []
+        routed_items = self.routed_to["Items"]
+        routed_categories = self.routed_to["Categories"]
+        return sorted((key, name) for key, (name, parent) in self.catalog["Items"].items()
+                      if key not in routed_items and parent not in routed_categories)
+
+    def report(self) -> Dict:
+        return {
+            "printers": sorted(self.printer_routes),
+            "catalog": {kind: len(entries) for kind, entries in self.catalog.items()},
+            "dangling": [{"printer": p, "kind": k, "key": key} for p, k, key in self.dangling_references()],
+            "unrouted_items": [{"key": key, "name": name} for key, name in self.unrouted_items()],
+        }
+
+
+def find_menus(root: str) -> List[str]:
+    if os.path.isfile(root):
+        return [root]
+    menus = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower() == "menu.xml":
+                menus.append(os.path.join(dirpath, filename))
+    return sorted(menus)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Audit du routage des imprimantes dans menu.xml")
+    parser.add_argument("paths", nargs="+", help="Fichiers menu.xml ou dossiers de restaurants")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    problems = 0
+    for root in args.paths:
+        for path in find_menus(root):
+            try:
+                report = PrinterRouting.from_menu(path).report()
+            except Exception as e:
+                report = {"error": str(e)}
+            results[path] = report
+            problems += len(report.get("dangling", [])) + len(report.get("unrouted_items", [])) + ("error" in report)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        for path, report in results.items():
+            if "error" in report:
+                print(f"❌ {path} : {report['error']}")
+                continue
+            status = "✅" if not report["dangling"] and not report["unrouted_items"] else "⚠️"
+            print(f"{status} {path} : {len(report['printers'])} imprimantes, "
+                  f"{report['catalog']['Items']} items, {len(report['dangling'])} références orphelines, "
+                  f"{len(report['unrouted_items'])} items non routés")
+            for ref in report["dangling"]:
+                print(f"    - {ref['printer']} → {ref['kind']} '{ref['key']}' introuvable")
+            for item in report["unrouted_items"]:
+                print(f"    - item '{item['key']}' ({item['name']}) sans imprimante")
+        print(f"{len(results)} menus analysés, {problems} problèmes")
+
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from storage import HASH_CHUNK_SIZE, new_digest
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = ".snapshots"
+DEFAULT_KEEP = 20
+
+
+def _is_tracked(name: str) -> bool:
+    return name.lower().endswith(".xml")
+
+
+class SnapshotStore:
+    """Instantanés du dossier xml : chaque version de fichier est stockée une seule fois
+    sous son empreinte BLAKE2, un instantané n'est qu'un petit manifeste JSON."""
+
+    def __init__(self, folder: str, store: Optional[str] = None):
+        self.folder = folder
+        self.store = store or os.path.join(folder, SNAPSHOT_DIR)
+        self.objects = os.path.join(self.store, "objects")
+        self.manifests = os.path.join(self.store, "manifests")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def _manifest_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.manifests, f"{snapshot_id}.json")
+
+    def tracked_files(self) -> List[str]:
+        try:
+            return sorted(entry.name for entry in os.scandir(self.folder)
+                          if entry.is_file() and _is_tracked(entry.name))
+        except FileNotFoundError:
+            return []
+
+    def list(self) -> List[str]:
+        try:
+            return sorted(name[:-5] for name in os.listdir(self.manifests) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def manifest(self, snapshot_id: str) -> Dict:
+        with open(self._manifest_path(snapshot_id), 'r', encoding="utf-8") as f:
+            return json.load(f)
+
+    def latest(self) -> Optional[Dict]:
+        snapshots = self.list()
+        return self.manifest(snapshots[-1]) if snapshots else None
+
+    def _store_object(self, path: str) -> str:
+        """Copie le fichier dans un objet temporaire en calculant l'empreinte au passage (une seule lecture)."""
+        os.makedirs(self.objects, exist_ok=True)
+        tmp = os.path.join(self.objects, f"incoming-{os.getpid()}-{time.time_ns()}.tmp")
+        digest = new_digest()
+        try:
+            with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+                for chunk in iter(lambda: src.read(HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            key = digest.hexdigest()
+            target = self._object_path(key)
+            if os.path.exists(target):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp, target)
+            return key
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def snapshot(self, label: str = "", names: Optional[Iterable[str]] = None) -> Optional[str]:
+        names = sorted(names) if names is not None else self.tracked_files()
+        previous = self.latest()
+        known = previous["files"] if previous else {}
+
+        files = {}
+        for name in names:
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entry = known.get(name)
+            if (entry is not None and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+                    and os.path.exists(self._object_path(entry["hash"]))):
+                files[name] = entry
+            else:
+                files[name] = {"hash": self._store_object(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+        if not files:
+            return None
+        if previous is not None and {n: e["hash"] for n, e in files.items()} == \
+                {n: e["hash"] for n, e in known.items()}:
+            return previous["id"]
+
+        now = time.time_ns()
+        snapshot_id = time.strftime("%Y%m%d-%H%M%S", time.localtime(now / 1e9)) + f"-{now % 1_000_000_000:09d}"
+        manifest = {"id": snapshot_id, "label": label, "created": now / 1e9, "files": files}
+        os.makedirs(self.manifests, exist_ok=True)
+        tmp = self._manifest_path(snapshot_id) + ".tmp"
+        with open(tmp, 'w', encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self._manifest_path(snapshot_id))
+        logger.info(f"Instantané {snapshot_id} ({label or 'manuel'}) : {len(files)} fichiers")
+        return snapshot_id
+
+    def restore(self, snapshot_id: str, names: Optional[Iterable[str]] = None, link: bool = False) -> List[str]:
+        """Restaure les fichiers qui diffèrent de l'instantané. Avec link=True, les objets sont
+        liés (liens physiques) au lieu d'être copiés ; à réserver aux dossiers jamais réécrits sur place."""
+        manifest = self.manifest(snapshot_id)
+        wanted = set(names) if names is not None else None
+        restored = []
+        for name, entry in manifest["files"].items():
+            if wanted is not None and name not in wanted:
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+                if st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]:
+                    continue
+            except FileNotFoundError:
+                pass
+            source = self._object_path(entry["hash"])
+            tmp = f"{path}.restore"
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            try:
+                if not link:
+                    raise OSError
+                os.link(source, tmp)
+            except OSError:
+                shutil.copyfile(source, tmp)
+            os.utime(tmp, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            os.replace(tmp, path)
+            restored.append(name)
+        logger.info(f"Instantané {snapshot_id} restauré : {', '.join(restored) or 'aucun changement'}")
+        return restored
+
+    def prune(self, keep: int = DEFAULT_KEEP) -> List[str]:
+        snapshots = self.list()
+        removed = snapshots[:-keep] if keep > 0 else snapshots
+        for snapshot_id in removed:
+            os.remove(self._manifest_path(snapshot_id))
+        return removed
+
+    def referenced(self) -> Set[str]:
+        hashes = set()
+        for snapshot_id in self.list():
+            hashes.update(entry["hash"] for entry in self.manifest(snapshot_id)["files"].values())
+        return hashes
+
+    def gc(self) -> int:
+        referenced = self.referenced()
+        removed = 0
+        if not os.path.isdir(self.objects):
+            return removed
+        for prefix in os.scandir(self.objects):
+            if not prefix.is_dir():
+                if prefix.name.endswith(".tmp"):
+                    os.remove(prefix.path)
+                continue
+            for entry in os.scandir(prefix.path):
+                if prefix.name + entry.name not in referenced:
+                    os.remove(entry.path)
+                    removed += 1
+        if removed:
+            logger.info(f"Instantanés : {removed} objets non référencés supprimés")
+        return removed
+
+    def auto_snapshot(self, label: str, keep: int = DEFAULT_KEEP) -> Optional[str]:
+        try:
+            snapshot_id = self.snapshot(label)
+            if self.prune(keep):
+                self.gc()
+            return snapshot_id
+        except Exception as e:
+            logger.warning(f"Instantané {label} impossible : {e}")
+            return None
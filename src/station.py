@@ -8,9 +8,12 @@ import logging
 import re
 import subprocess
 import threading
-import xml.etree.ElementTree as ET
+import queue
 from validators import DataValidator
 from config_manager import XMLConfigManager
+from storage import ShareStorage
+import xml_diff
+import station_sync
 from utils import setup_logging, can_rename_computer, rename_computer_windows
 import system_config
 
@@ -32,6 +35,11 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+STATION_CONFIG_KEYS = ["GUI_Font_Size", "GUI_List_Height", "GUI_Dark_Mode"]
+PULL_POLL_MS = 100
+WATCHER_POLL_MS = 500
+
+
 class StationApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -50,16 +58,39 @@ class StationApp(ctk.CTk):
         self.validator = DataValidator()
         self.config_manager = XMLConfigManager()
         
-        self.config_data = self.config_manager.load_config_data([
-            "GUI_Font_Size", "GUI_List_Height", "GUI_Dark_Mode"
-        ])
+        self.config_data = self.config_manager.load_config_data(STATION_CONFIG_KEYS)
+        
+        self.pull = None
+        self.pull_workers = station_sync.DEFAULT_WORKERS
+        self.pull_deadline = station_sync.DEFAULT_DEADLINE
         
         self.create_ui()
         
+        self.watcher = self.config_manager.watcher()
+        if self.watcher is not None:
+            self.watcher_events = queue.Queue()
+            self.watcher.subscribe(self.watcher_events.put)
+            self.watcher.start()
+            self.after(WATCHER_POLL_MS, self._poll_watcher)
+        
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         logger.info("Application Station POS démarrée")
 
+    def _poll_watcher(self):
+        while True:
+            try:
+                changes = self.watcher_events.get_nowait()
+            except queue.Empty:
+                break
+            self._on_xml_changed(changes)
+        self.after(WATCHER_POLL_MS, self._poll_watcher)
+
+    def _on_xml_changed(self, changes):
+        if any(change.name.lower() == "config.xml" for change in changes):
+            self.config_data = self.config_manager.load_config_data(STATION_CONFIG_KEYS)
+            logger.info(f"config.xml modifié sur le disque, paramètres rechargés : {self.config_data}")
+
     def create_ui(self):
         main_frame = ctk.CTkFrame(self)
         main_frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -91,6 +122,7 @@ class StationApp(ctk.CTk):
         
         self._create_maintenance_button(buttons_frame)
         self._create_system_config_button(buttons_frame)
+        self._create_diff_button(buttons_frame)
 
     def _create_hostname_section(self, parent, side="left"):
         hostname_frame = ctk.CTkFrame(parent)
@@ -256,6 +288,52 @@ class StationApp(ctk.CTk):
             hover_color="#f39c12"
         ).pack(fill="x", pady=(5, 10), padx=5)
     
+    def _create_diff_button(self, parent):
+        ctk.CTkButton(
+            parent, 
+            text="🔍 Comparer avec le serveur",
+            command=self.open_diff_window,
+            height=35,
+            font=("Arial", 13, "bold")
+        ).pack(fill="x", pady=(0, 10), padx=5)
+    
+    def open_diff_window(self):
+        ip = self.server_entry.get().strip()
+        if not ip:
+            messagebox.showwarning("Adresse vide", "Veuillez entrer une adresse IP ou un nom de serveur.")
+            return
+        
+        diff_win = ctk.CTkToplevel(self)
+        diff_win.title("Différences station / serveur")
+        diff_win.geometry("900x600")
+        diff_win.transient(self)
+        
+        ctk.CTkLabel(diff_win, text=f"🔍 C:\\pos\\xml ↔ \\\\{ip}\\xml", font=("Arial", 16, "bold")).pack(pady=10)
+        
+        diff_text = ctk.CTkTextbox(diff_win, font=("Courier", 11))
+        diff_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        diff_text.insert("end", "Comparaison en cours...\n")
+        
+        ctk.CTkButton(diff_win, text="Fermer", command=diff_win.destroy).pack(pady=10)
+        
+        def show(text):
+            if diff_win.winfo_exists():
+                diff_text.delete("1.0", "end")
+                diff_text.insert("end", text)
+        
+        def worker():
+            try:
+                report = xml_diff.diff_folders(r"C:\pos\xml", ShareStorage(ip).root)
+                text = xml_diff.format_report(report, limit=200)
+                text += f"\n\n{xml_diff.count_differences(report)} différences"
+                logger.info(f"[STATION] Comparaison avec {ip} : {xml_diff.count_differences(report)} différences")
+            except Exception as e:
+                text = f"❌ Erreur lors de la comparaison : {e}"
+                logger.error(f"[STATION] Erreur comparaison: {e}", exc_info=True)
+            self.after(0, lambda: show(text))
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
     def open_maintenance_window(self):
         maint_win = ctk.CTkToplevel(self)
         maint_win.title("Maintenance système")
@@ -463,120 +541,131 @@ class StationApp(ctk.CTk):
             messagebox.showwarning("Adresse vide", "Veuillez entrer une adresse IP ou un nom de serveur.")
             return
         
-        files_to_copy = ["config.xml", "menu.xml", "Floor.xml", "layout.xml"]
-        dest_folder = r"C:\pos\xml"
-        
-        try:
-            logger.info(f"📁 Création du dossier de destination: {dest_folder}")
-            os.makedirs(dest_folder, exist_ok=True)
-            
-            successful_copies = 0
-            failed_copies = []
-            
-            for filename in files_to_copy:
-                src = f"\\\\{ip}\\xml\\{filename}"
-                dst = os.path.join(dest_folder, filename)
-                
-                try:
-                    logger.info(f"📥 Copie de {filename}...")
-                    shutil.copy2(src, dst)
-                    successful_copies += 1
-                    logger.info(f"  ✅ {filename} copié avec succès")
-                except FileNotFoundError:
-                    failed_copies.append(f"{filename} (fichier introuvable sur le serveur)")
-                    logger.warning(f"  ⚠️ {filename} introuvable")
-                except PermissionError:
-                    failed_copies.append(f"{filename} (accès refusé)")
-                    logger.error(f"  ❌ {filename} - accès refusé")
-                except Exception as e:
-                    failed_copies.append(f"{filename} ({str(e)})")
-                    logger.error(f"  ❌ {filename} - erreur: {e}")
-            
-            if successful_copies > 0:
-                logger.info(f"🔧 Mise à jour de la configuration...")
-                self._update_config_file(dest_folder, ip)
-            
-            summary = f"✅ {successful_copies} fichiers copiés avec succès"
-            if failed_copies:
-                summary += f"\n⚠️ {len(failed_copies)} échecs:\n  - " + "\n  - ".join(failed_copies)
-            
-            logger.info(f"{summary}")
-            
-            if successful_copies == len(files_to_copy):
-                messagebox.showinfo("Succès complet", "Tous les fichiers ont été copiés et configurés!")
-            elif successful_copies > 0:
-                messagebox.showwarning(
-                    "Succès partiel", 
-                    f"{successful_copies}/{len(files_to_copy)} fichiers copiés.\n\n"
-                    f"Fichiers échoués:\n" + "\n".join(failed_copies)
-                )
-            else:
-                messagebox.showerror(
-                    "Échec", 
-                    "Aucun fichier n'a pu être copié.\n\n"
-                    "Vérifiez que:\n"
-                    "1. Le serveur est accessible\n"
-                    "2. Le partage \\xml existe\n"
-                    "3. Vous avez les permissions nécessaires"
-                )
-        
-        except Exception as e:
-            error_msg = f"Erreur lors de la copie: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            messagebox.showerror("Erreur", error_msg)
-
-    def _update_config_file(self, dest_folder: str, server_ip: str):
-        config_path = os.path.join(dest_folder, "config.xml")
-        
-        if not os.path.exists(config_path):
-            logger.warning("  ⚠️ config.xml introuvable - pas de mise à jour")
+        if self.pull is not None:
+            messagebox.showwarning("Copie en cours", "Une copie depuis le serveur est déjà en cours.")
             return
         
-        try:
-            tree = ET.parse(config_path)
-            root = tree.getroot()
-            
-            updated = False
-            
-            server_elem = root.find("Server")
-            if server_elem is not None:
-                server_elem.text = server_ip
-                updated = True
-                logger.info(f"  ✅ Adresse serveur mise à jour: {server_ip}")
-            
-            database_elem = root.find("Database")
-            if database_elem is not None:
-                database_elem.text = server_ip
-                updated = True
-                logger.info(f"  ✅ Adresse base de données mise à jour: {server_ip}")
-            
-            font_size = self.config_data.get("GUI_Font_Size")
-            if font_size:
-                font_elem = root.find("GUI_Font_Size")
-                if font_elem is not None:
-                    font_elem.text = font_size
-                    updated = True
-                    logger.info(f"  ✅ Taille de police mise à jour: {font_size}")
-            
-            list_height = self.config_data.get("GUI_List_Height")
-            if list_height:
-                height_elem = root.find("GUI_List_Height")
-                if height_elem is not None:
-                    height_elem.text = list_height
-                    updated = True
-                    logger.info(f"  ✅ Hauteur de liste mise à jour: {list_height}")
-            
-            if updated:
-                tree.write(config_path, encoding="utf-8", xml_declaration=True)
-                logger.info("  💾 config.xml sauvegardé")
-            else:
-                logger.warning("  ⚠️ Aucun élément Server/Database trouvé dans config.xml")
-        
-        except ET.ParseError as e:
-            logger.error(f"  ❌ Erreur de lecture XML: {e}")
-        except Exception as e:
-            logger.error(f"  ❌ Erreur lors de la mise à jour: {e}")
+        config_patch = {
+            "Server": ip,
+            "Database": ip,
+            "GUI_Font_Size": self.config_data.get("GUI_Font_Size"),
+            "GUI_List_Height": self.config_data.get("GUI_List_Height"),
+        }
+        self.pull = station_sync.StationPull(ip, station_sync.DEST_FOLDER, workers=self.pull_workers,
+                                             deadline=self.pull_deadline, config_patch=config_patch,
+                                             snapshot_label="copie station")
+        self._open_pull_window(self.pull)
+        logger.info(f"📥 Copie de {len(self.pull.files)} fichiers depuis {self.pull.source_root} "
+                    f"({self.pull.workers} en parallèle, délai {self.pull.deadline:.0f} s par fichier)")
+        self.pull.start()
+        self.after(PULL_POLL_MS, self._poll_pull)
+    
+    def _open_pull_window(self, pull):
+        self.pull_win = ctk.CTkToplevel(self)
+        self.pull_win.title("Copie depuis le serveur")
+        self.pull_win.geometry("520x320")
+        self.pull_win.transient(self)
+        self.pull_win.protocol("WM_DELETE_WINDOW", pull.cancel)
+        
+        ctk.CTkLabel(self.pull_win, text=f"📥 {pull.source_root} → {pull.dest_folder}",
+                     font=("Arial", 14, "bold")).pack(pady=10)
+        
+        self.pull_rows = {}
+        for filename in pull.files:
+            row = ctk.CTkFrame(self.pull_win, fg_color="transparent")
+            row.pack(fill="x", padx=15, pady=4)
+            ctk.CTkLabel(row, text=filename, width=110, anchor="w").pack(side="left")
+            bar = ctk.CTkProgressBar(row, width=220)
+            bar.set(0)
+            bar.pack(side="left", padx=10)
+            status = ctk.CTkLabel(row, text="En attente", width=150, anchor="w")
+            status.pack(side="left")
+            self.pull_rows[filename] = (bar, status)
+        
+        self.pull_cancel_btn = ctk.CTkButton(self.pull_win, text="Annuler", command=pull.cancel,
+                                             fg_color="#c0392b", hover_color="#e74c3c")
+        self.pull_cancel_btn.pack(pady=15)
+    
+    def _poll_pull(self):
+        pull = self.pull
+        while True:
+            try:
+                event = pull.events.get_nowait()
+            except queue.Empty:
+                break
+            if event.status == station_sync.FINISHED:
+                self._finish_pull(pull)
+                return
+            self._show_pull_event(event)
+        self.after(PULL_POLL_MS, self._poll_pull)
+    
+    def _show_pull_event(self, event):
+        bar, status = self.pull_rows[event.filename]
+        if not self.pull_win.winfo_exists():
+            return
+        if event.status == station_sync.STARTED:
+            status.configure(text="Copie...")
+        elif event.status == station_sync.PROGRESS:
+            if event.total:
+                bar.set(event.done / event.total)
+            status.configure(text=f"{event.done // 1024} / {event.total // 1024} Ko")
+        elif event.status == station_sync.COPIED:
+            bar.set(1)
+            status.configure(text=f"✅ Copié ({event.message})" if event.message else "✅ Copié")
+            logger.info(f"  ✅ {event.filename} copié avec succès")
+        elif event.status == station_sync.UNCHANGED:
+            bar.set(1)
+            status.configure(text="✅ Déjà à jour")
+            logger.info(f"  ⏭️ {event.filename} déjà à jour ({event.message})")
+        else:
+            status.configure(text=f"❌ {event.message}")
+            logger.warning(f"  ⚠️ {event.filename} - {event.message}")
     
+    def _finish_pull(self, pull):
+        self.pull = None
+        if self.pull_win.winfo_exists():
+            self.pull_win.destroy()
+        
+        successful_copies = len(pull.succeeded)
+        failed_copies = [f"{event.filename} ({event.message})" for event in pull.failed]
+        
+        stats_lines = [
+            f"{len(pull.transferred)} transférés, {len(pull.unchanged)} déjà à jour",
+            f"{station_sync.format_bytes(pull.bytes_transferred)} transférés, "
+            f"{station_sync.format_bytes(pull.bytes_saved)} économisés",
+            f"Durée : {pull.elapsed:.1f} s (installation {pull.install_ms:.0f} ms)",
+        ]
+        stats = "\n".join(stats_lines)
+        summary = f"✅ {successful_copies} fichiers copiés avec succès ({', '.join(stats_lines)})"
+        if failed_copies:
+            summary += f"\n⚠️ {len(failed_copies)} échecs:\n  - " + "\n  - ".join(failed_copies)
+        
+        logger.info(f"{summary}")
+        
+        if pull.cancelled:
+            messagebox.showwarning(
+                "Copie annulée",
+                "Aucun fichier n'a été modifié dans C:\\pos\\xml.\n\n"
+                f"Fichiers non installés:\n" + "\n".join(failed_copies)
+            )
+        elif successful_copies == len(pull.files):
+            messagebox.showinfo("Succès complet", f"Tous les fichiers ont été copiés et configurés!\n\n{stats}")
+        elif successful_copies > 0:
+            messagebox.showwarning(
+                "Succès partiel", 
+                f"{successful_copies}/{len(pull.files)} fichiers copiés.\n{stats}\n\n"
+                f"Fichiers échoués:\n" + "\n".join(failed_copies)
+            )
+        else:
+            messagebox.showerror(
+                "Échec", 
+                "Aucun fichier n'a pu être copié.\n\n"
+                "Vérifiez que:\n"
+                "1. Le serveur est accessible\n"
+                "2. Le partage \\xml existe\n"
+                "3. Vous avez les permissions nécessaires"
+            )
+
     def open_system_config_window(self):
         config_win = ctk.CTkToplevel(self)
         config_win.title("Configuration Auto PC")
@@ -764,6 +853,9 @@ class StationApp(ctk.CTk):
     
     def on_closing(self):
         logger.info("Fermeture de l'application station")
+        if self.pull is not None:
+            self.pull.cancel()
+        logger.info(f"Cache XML : {self.config_manager.cache_stats()}")
         self.destroy()
         sys.exit(0)
 
@@ -0,0 +1,692 @@
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import BinaryIO, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import delta_sync
+import xml_manifest
+from config_manager import replace_attributes
+from snapshots import SnapshotStore
+from storage import Opener, ShareStorage, file_digest, new_digest, open_binary
+
+logger = logging.getLogger(__name__)
+
+DEST_FOLDER = r"C:\pos\xml"
+PULL_FILES = xml_manifest.PUBLISHED_FILES
+STATE_NAME = ".pull-state.json"
+STAGING_DIR = ".staging"
+CONFIG_FILE = "config.xml"
+BUNDLE_TASK = "<archive>"
+BUNDLE_SUFFIX = ".bundle"
+DEFAULT_WORKERS = 4
+DEFAULT_DEADLINE = 30.0
+CHUNK_SIZE = 256 * 1024
+POLL_INTERVAL = 0.1
+
+STARTED = "started"
+PROGRESS = "progress"
+COPIED = "copied"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+FINISHED = "finished"
+
+FINAL_STATUSES = (COPIED, UNCHANGED, FAILED, TIMEOUT, CANCELLED)
+SUCCESS_STATUSES = (COPIED, UNCHANGED)
+
+
+class PullEvent(NamedTuple):
+    filename: Optional[str]
+    status: str
+    done: int = 0
+    total: int = 0
+    message: str = ""
+
+
+def format_bytes(size: int) -> str:
+    for unit, factor in (("Mo", 1024 ** 2), ("Ko", 1024)):
+        if size >= factor:
+            return f"{size / factor:.1f} {unit}"
+    return f"{size} o"
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class PullCancelled(Exception):
+    pass
+
+
+class PullTimeout(Exception):
+    pass
+
+
+class SourceMissing(Exception):
+    pass
+
+
+class VerifyError(Exception):
+    pass
+
+
+class BundleError(VerifyError):
+    pass
+
+
+class _CountingReader:
+    """Lecture seekable qui compte les octets réellement lus sur le serveur."""
+
+    def __init__(self, f: BinaryIO, counted: Callable[[int], None]):
+        self.f = f
+        self.counted = counted
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.counted(len(data))
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.f.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.f.tell()
+
+    def seekable(self) -> bool:
+        return True
+
+
+class StationPull:
+    """Rapatrie les fichiers xml du serveur sur un pool de threads, hors du thread Tk.
+
+    Chaque fichier a son propre délai maximal, compté à partir du début de sa copie ; un fichier
+    bloqué (serveur muet, délai SMB) est abandonné sans bloquer les autres. La progression est
+    publiée dans ``events`` (queue.Queue), que l'interface vide à son rythme.
+
+    Seuls les fichiers qui diffèrent sont transférés : (mtime_ns, taille) du serveur comparés à
+    l'état du dernier rapatriement (``.pull-state.json``), puis, si cela ne suffit pas à trancher,
+    l'empreinte publiée dans le manifeste du serveur comparée à celle de la copie locale.
+
+    Si le manifeste annonce une archive, les fichiers à transférer sont lus dans cette seule
+    archive (une ouverture SMB, seuls les membres utiles sont lus), vérifiés puis remplacés
+    ensemble ; la copie fichier par fichier ne sert plus que de repli. Les fichiers de
+    ``delta_files`` (menu.xml) déjà présents localement ne passent pas par l'archive : ils sont
+    reconstruits bloc par bloc à partir de la copie locale et de leur signature ``.sig``.
+
+    Rien n'est écrit directement dans ``dest_folder`` : chaque fichier est écrit une seule fois dans
+    ``.staging``, vérifié (taille, empreinte du manifeste ou de la signature) et synchronisé sur
+    disque ; ``config_patch`` (adresse du serveur, police, hauteur de liste) est appliqué en mémoire
+    à config.xml avant cette écriture. Les fichiers prêts sont ensuite mis en place par une série
+    d'os.replace, sans autre entrée/sortie, pour que le POS ne voie jamais de fichier incomplet
+    ou config.xml non retouché. Une annulation n'installe rien. Avec ``snapshot_label``, un
+    instantané du dossier local est pris sur le thread de copie avant toute préparation.
+
+    Toutes les lectures côté serveur passent par ``opener``."""
+
+    def __init__(self, server: str, dest_folder: str = DEST_FOLDER, files: Optional[List[str]] = None,
+                 workers: int = DEFAULT_WORKERS, deadline: float = DEFAULT_DEADLINE,
+                 delta_files: Optional[List[str]] = None, opener: Opener = open_binary,
+                 config_patch: Optional[Dict[str, str]] = None, snapshot_label: Optional[str] = None):
+        self.server = server
+        self.source_root = ShareStorage(server).root
+        self.dest_folder = dest_folder
+        self.files = list(files or PULL_FILES)
+        self.workers = max(1, workers)
+        self.deadline = deadline
+        self.delta_files = set(delta_sync.DELTA_FILES if delta_files is None else delta_files)
+        self.opener = opener
+        self.config_patch = {key: value for key, value in (config_patch or {}).items() if value}
+        self.snapshot_label = snapshot_label
+        self.snapshot_id: Optional[str] = None
+        self.events: "queue.Queue[PullEvent]" = queue.Queue()
+        self.results: Dict[str, PullEvent] = {}
+        self.manifest: Dict = {}
+        self.state: Dict[str, Dict] = {}
+        self.bundle_bytes = 0
+        self.bundled: List[str] = []
+        self.staged: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self.installed: List[str] = []
+        self.install_ms = 0.0
+        self.elapsed = 0.0
+        self._cancel = threading.Event()
+        self._abandoned = set()
+        self._started_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def source_path(self, filename: str) -> str:
+        return os.path.join(self.source_root, filename)
+
+    def dest_path(self, filename: str) -> str:
+        return os.path.join(self.dest_folder, filename)
+
+    @property
+    def staging_folder(self) -> str:
+        return os.path.join(self.dest_folder, STAGING_DIR)
+
+    def staging_path(self, filename: str) -> str:
+        return os.path.join(self.staging_folder, filename)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.dest_folder, STATE_NAME)
+
+    def _status(self, filename: str) -> str:
+        event = self.results.get(filename)
+        return event.status if event is not None else ""
+
+    @property
+    def succeeded(self) -> List[str]:
+        return [name for name in self.files if self._status(name) in SUCCESS_STATUSES]
+
+    @property
+    def transferred(self) -> List[str]:
+        return [name for name in self.files if self._status(name) == COPIED]
+
+    @property
+    def unchanged(self) -> List[str]:
+        return [name for name in self.files if self._status(name) == UNCHANGED]
+
+    @property
+    def failed(self) -> List[PullEvent]:
+        return [event for event in self.results.values() if event.status not in SUCCESS_STATUSES]
+
+    @property
+    def bytes_transferred(self) -> int:
+        return sum(self.results[name].done for name in self.transferred) + self.bundle_bytes
+
+    @property
+    def bytes_saved(self) -> int:
+        """Fichiers déjà à jour, blocs réutilisés par le transfert différentiel et gain de
+        compression de l'archive, moins ce qui a été lu dans une archive finalement inutilisée."""
+        saved = sum(self.results[name].total for name in self.unchanged)
+        saved += sum(self.results[name].total - self.results[name].done
+                     for name in self.transferred if name not in self.bundled)
+        bundled = sum(self.results[name].total for name in self.bundled)
+        return saved + bundled - self.bundle_bytes
+
+    def cancel(self):
+        self._cancel.set()
+
+    def start(self) -> "StationPull":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="station-pull", daemon=True)
+            self._thread.start()
+        return self
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _emit(self, event: PullEvent):
+        if event.status in FINAL_STATUSES:
+            with self._lock:
+                if event.filename in self.results:
+                    return
+                self.results[event.filename] = event
+        self.events.put(event)
+
+    def _override(self, event: PullEvent):
+        """Remplace le résultat d'un fichier déjà préparé (retouche, annulation ou échec de l'installation)."""
+        with self._lock:
+            self.results[event.filename] = event
+        self.events.put(event)
+
+    def _check(self, filename: str):
+        if self._cancel.is_set():
+            raise PullCancelled()
+        with self._lock:
+            if filename in self._abandoned:
+                raise PullTimeout()
+        if time.monotonic() - self._started_at[filename] > self.deadline:
+            raise PullTimeout()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding="utf-8") as f:
+                self.state = json.load(f)
+        except FileNotFoundError:
+            self.state = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"État du dernier rapatriement illisible, copie complète : {e}")
+            self.state = {}
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with self._lock:
+            data = json.dumps(self.state, indent=2)
+        try:
+            with open(tmp, 'w', encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            logger.warning(f"Impossible d'enregistrer l'état du rapatriement : {e}")
+
+    def _remember(self, filename: str, server: Tuple[int, int], digest: str):
+        with self._lock:
+            self.state[filename] = {"server": list(server), "digest": digest,
+                                    "local": list(_stamp(self.dest_path(filename)) or ())}
+
+    def _patches(self, filename: str) -> bool:
+        return filename == CONFIG_FILE and bool(self.config_patch)
+
+    def _patch(self, filename: str, data: bytes) -> bytes:
+        content, found = replace_attributes(data.decode("utf-8"), self.config_patch)
+        for key in self.config_patch:
+            if key not in found:
+                logger.warning(f"  ⚠️ Attribut {key} absent de {filename}, non modifié")
+        return content.encode("utf-8")
+
+    def _write_staged(self, filename: str, data: bytes, mtime_ns: int, path: Optional[str] = None):
+        path = path or self.staging_path(filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def _stage(self, filename: str, server: Tuple[int, int], digest: str):
+        self._check(filename)
+        with self._lock:
+            self.staged[filename] = (server, digest)
+
+    def _unchanged(self, filename: str, server: Tuple[int, int]) -> Optional[str]:
+        local = _stamp(self.dest_path(filename))
+        if local is None:
+            return None
+        with self._lock:
+            known = self.state.get(filename)
+        local_digest = None
+        if known is not None and tuple(known["local"]) == local:
+            if tuple(known["server"]) == server:
+                return "taille et date identiques"
+            local_digest = known["digest"]
+
+        entry = self.manifest.get("files", {}).get(filename)
+        if entry is None or (entry["mtime_ns"], entry["size"]) != server:
+            return None
+        if local_digest is None:
+            if local[1] != entry["size"]:
+                return None
+            local_digest = file_digest(self.dest_path(filename))
+        if local_digest != entry["digest"]:
+            return None
+        self._remember(filename, server, local_digest)
+        return "empreinte identique"
+
+    def _pull(self, filename: str) -> PullEvent:
+        with self._lock:
+            self._started_at[filename] = time.monotonic()
+        self._emit(PullEvent(filename, STARTED))
+        server = self._source_stamp(filename)
+        self._check(filename)
+        reason = self._unchanged(filename, server)
+        if reason is not None:
+            return PullEvent(filename, UNCHANGED, 0, server[1], reason)
+        if filename in self.delta_files:
+            event = self._delta(filename, server)
+            if event is not None:
+                return event
+        return self._copy(filename)
+
+    def _delta_ready(self, filename: str) -> bool:
+        return filename in self.delta_files and _stamp(self.dest_path(filename)) is not None
+
+    def _delta(self, filename: str, server: Tuple[int, int]) -> Optional[PullEvent]:
+        """Transfert différentiel ; None si la signature manque, est périmée ou si la
+        reconstruction échoue (la copie complète prend alors le relais)."""
+        if not self._delta_ready(filename):
+            return None
+        src = self.source_path(filename)
+        signature = delta_sync.read_signature(src, self.opener)
+        if signature is None or (signature.mtime_ns, signature.size) != server:
+            return None
+        tmp = self.staging_path(filename)
+        try:
+            fetched, reused = delta_sync.delta_copy(
+                src, self.dest_path(filename), tmp, signature, self.opener,
+                check=lambda: self._check(filename),
+                progress=lambda done: self._emit(PullEvent(filename, PROGRESS, done, signature.size)))
+            os.utime(tmp, ns=(signature.mtime_ns, signature.mtime_ns))
+            self._stage(filename, server, signature.digest.hex())
+        except (PullCancelled, PullTimeout):
+            self._discard(tmp)
+            raise
+        except (delta_sync.DeltaError, OSError) as e:
+            self._discard(tmp)
+            logger.warning(f"Transfert différentiel de {filename} impossible, copie complète : {e}")
+            return None
+        return PullEvent(filename, COPIED, fetched, signature.size, f"différentiel, {format_bytes(reused)} réutilisés")
+
+    @staticmethod
+    def _discard(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _source_stamp(self, filename: str) -> Tuple[int, int]:
+        server = _stamp(self.source_path(filename))
+        if server is None:
+            raise SourceMissing(self.source_path(filename))
+        return server
+
+    def _open_source(self, filename: str) -> BinaryIO:
+        try:
+            return self.opener(self.source_path(filename))
+        except FileNotFoundError as e:
+            raise SourceMissing(self.source_path(filename)) from e
+
+    def _copy(self, filename: str) -> PullEvent:
+        tmp = self.staging_path(filename)
+        digest = new_digest()
+        patch = self._patches(filename)
+        done = 0
+        try:
+            server = self._source_stamp(filename)
+            with self._open_source(filename) as fsrc:
+                total = server[1]
+                with (io.BytesIO() if patch else open(tmp, 'wb')) as fdst:
+                    while True:
+                        self._check(filename)
+                        chunk = fsrc.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        fdst.write(chunk)
+                        digest.update(chunk)
+                        done += len(chunk)
+                        self._emit(PullEvent(filename, PROGRESS, done, total))
+                    self._verify(filename, server, done, digest.hexdigest())
+                    if patch:
+                        self._write_staged(filename, self._patch(filename, fdst.getvalue()), server[0])
+                    else:
+                        fdst.flush()
+                        os.fsync(fdst.fileno())
+            if not patch:
+                os.utime(tmp, ns=(server[0], server[0]))
+            self._stage(filename, server, digest.hexdigest())
+            return PullEvent(filename, COPIED, done, total)
+        except BaseException:
+            self._discard(tmp)
+            raise
+
+    def _verify(self, filename: str, server: Tuple[int, int], size: int, digest: str):
+        if size != server[1]:
+            raise VerifyError(f"{size} o reçus au lieu de {server[1]} (fichier modifié pendant la copie ?)")
+        entry = self.manifest.get("files", {}).get(filename)
+        if entry is not None and (entry["mtime_ns"], entry["size"]) == server and entry["digest"] != digest:
+            raise VerifyError("empreinte différente du manifeste")
+
+    def _result(self, filename: str, future: Future) -> PullEvent:
+        try:
+            return future.result()
+        except PullCancelled:
+            return PullEvent(filename, CANCELLED, message="annulé")
+        except PullTimeout:
+            return PullEvent(filename, TIMEOUT, message=f"délai de {self.deadline:.0f} s dépassé")
+        except SourceMissing:
+            return PullEvent(filename, FAILED, message="fichier introuvable sur le serveur")
+        except PermissionError:
+            return PullEvent(filename, FAILED, message="accès refusé")
+        except Exception as e:
+            return PullEvent(filename, FAILED, message=str(e))
+
+    def _fetch_bundle(self, bundle: Dict, targets: List[str]):
+        """Ouvre l'archive du serveur sans la télécharger : zipfile ne lit que le répertoire central
+        puis les seuls membres ``targets``, extraits sous ``<fichier>.bundle`` et vérifiés contre le
+        manifeste. Ils ne prennent leur nom de préparation qu'une fois tous vérifiés, et seulement si
+        la tâche n'a pas été abandonnée entre-temps : une archive abandonnée ne touche jamais aux
+        fichiers que la copie fichier par fichier prépare à sa place."""
+        entries = self.manifest["files"]
+        parts: Dict[str, str] = {}
+
+        def counted(size: int):
+            self.bundle_bytes += size
+
+        try:
+            with self.opener(self.source_path(bundle["name"])) as raw:
+                with zipfile.ZipFile(_CountingReader(raw, counted)) as zf:
+                    for name in targets:
+                        entry = entries[name]
+                        patch = self._patches(name)
+                        parts[name] = self.staging_path(name) + BUNDLE_SUFFIX
+                        member_digest = new_digest()
+                        done = 0
+                        with zf.open(name) as fsrc, (io.BytesIO() if patch else open(parts[name], 'wb')) as fdst:
+                            for chunk in iter(lambda: fsrc.read(CHUNK_SIZE), b""):
+                                self._check(BUNDLE_TASK)
+                                fdst.write(chunk)
+                                member_digest.update(chunk)
+                                done += len(chunk)
+                                self._emit(PullEvent(name, PROGRESS, done, entry["size"]))
+                            if member_digest.hexdigest() != entry["digest"]:
+                                raise BundleError(f"empreinte de {name} différente du manifeste")
+                            if patch:
+                                self._write_staged(name, self._patch(name, fdst.getvalue()), entry["mtime_ns"], parts[name])
+                            else:
+                                fdst.flush()
+                                os.fsync(fdst.fileno())
+                        os.utime(parts[name], ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            self._check(BUNDLE_TASK)
+            with self._lock:
+                if self._cancel.is_set():
+                    raise PullCancelled()
+                if BUNDLE_TASK in self._abandoned:
+                    raise PullTimeout()
+                for name in targets:
+                    entry = entries[name]
+                    os.replace(parts.pop(name), self.staging_path(name))
+                    self.staged[name] = ((entry["mtime_ns"], entry["size"]), entry["digest"])
+        except BaseException as e:
+            for path in parts.values():
+                self._discard(path)
+            if isinstance(e, (zipfile.BadZipFile, KeyError)):
+                raise BundleError(f"archive {bundle['name']} invalide : {e}") from e
+            raise
+
+    def _requeue(self, names: List[str]) -> List[str]:
+        """Fichiers rendus à la copie fichier par fichier : leur délai repart du début de leur
+        propre copie, pas de leur passage par l'archive."""
+        with self._lock:
+            for name in names:
+                self._started_at.pop(name, None)
+        return names
+
+    def _pull_bundle(self, executor: ThreadPoolExecutor) -> List[str]:
+        """Traite par l'archive tout ce que le manifeste décrit ; retourne les fichiers restant à
+        copier un par un (absents du manifeste ou modifiés depuis sa publication, ou tous en cas
+        d'archive absente ou invalide)."""
+        bundle = self.manifest.get("bundle")
+        entries = self.manifest.get("files", {})
+        if not bundle:
+            return list(self.files)
+
+        described = [name for name in self.files if name in entries]
+        try:
+            stamps = dict(zip(described, executor.map(_stamp, map(self.source_path, described),
+                                                      timeout=self.deadline)))
+        except Exception as e:
+            logger.warning(f"Serveur injoignable pour vérifier le manifeste, copie fichier par fichier : {str(e) or 'délai dépassé'}")
+            return list(self.files)
+        fresh = {name for name in described
+                 if stamps[name] == (entries[name]["mtime_ns"], entries[name]["size"])}
+
+        remaining = [name for name in self.files if name not in fresh]
+        targets = []
+        for name in self.files:
+            if name not in fresh:
+                continue
+            with self._lock:
+                self._started_at[name] = time.monotonic()
+            self._emit(PullEvent(name, STARTED))
+            entry = entries[name]
+            try:
+                reason = self._unchanged(name, (entry["mtime_ns"], entry["size"]))
+            except OSError:
+                reason = None
+            if reason is not None:
+                self._emit(PullEvent(name, UNCHANGED, 0, entry["size"], reason))
+            else:
+                targets.append(name)
+        remaining += [name for name in targets if self._delta_ready(name)]
+        targets = [name for name in targets if not self._delta_ready(name)]
+        if not targets:
+            return self._requeue(remaining)
+
+        with self._lock:
+            self._started_at[BUNDLE_TASK] = time.monotonic()
+        future = executor.submit(self._fetch_bundle, bundle, targets)
+        while True:
+            try:
+                future.result(timeout=POLL_INTERVAL)
+                break
+            except FuturesTimeout:
+                if not self._cancel.is_set() and time.monotonic() - self._started_at[BUNDLE_TASK] <= self.deadline + POLL_INTERVAL:
+                    continue
+                with self._lock:
+                    self._abandoned.add(BUNDLE_TASK)
+                if self._cancel.is_set():
+                    for name in targets + remaining:
+                        self._emit(PullEvent(name, CANCELLED, message="annulé"))
+                    return []
+                logger.warning(f"Archive {bundle['name']} abandonnée après {self.deadline:.0f} s, copie fichier par fichier")
+                return self._requeue(targets + remaining)
+            except PullCancelled:
+                for name in targets + remaining:
+                    self._emit(PullEvent(name, CANCELLED, message="annulé"))
+                return []
+            except Exception as e:
+                logger.warning(f"Archive {bundle['name']} inutilisable, copie fichier par fichier : {e}")
+                return self._requeue(targets + remaining)
+
+        self.bundled = list(targets)
+        for name in targets:
+            self._emit(PullEvent(name, COPIED, 0, entries[name]["size"], f"archive v{bundle['version']}"))
+        logger.info(f"📦 {len(targets)} fichiers extraits de {bundle['name']} ({format_bytes(self.bundle_bytes)})")
+        return self._requeue(remaining)
+
+    def _prepare_staging(self):
+        """Crée le dossier de préparation et le vide des restes d'un rapatriement interrompu."""
+        os.makedirs(self.staging_folder, exist_ok=True)
+        with os.scandir(self.staging_folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    self._discard(entry.path)
+
+    def _restage_config(self):
+        """config.xml inchangé sur le serveur mais retouches différentes (autre adresse saisie) :
+        la copie locale est retouchée en mémoire et préparée comme les autres."""
+        if self._status(CONFIG_FILE) != UNCHANGED or not self.config_patch:
+            return
+        with self._lock:
+            known = self.state.get(CONFIG_FILE)
+        if known is None:
+            return
+        with open(self.dest_path(CONFIG_FILE), 'rb') as f:
+            data = f.read()
+        patched = self._patch(CONFIG_FILE, data)
+        if patched != data:
+            self._write_staged(CONFIG_FILE, patched, known["server"][0])
+            with self._lock:
+                self.staged[CONFIG_FILE] = (tuple(known["server"]), known["digest"])
+            self._override(PullEvent(CONFIG_FILE, COPIED, 0, len(patched), "retouché"))
+
+    def _install(self):
+        with self._lock:
+            staged = [name for name in self.files if name in self.staged]
+        if self._cancel.is_set():
+            for name in staged:
+                self._discard(self.staging_path(name))
+                self._override(PullEvent(name, CANCELLED, message="annulé, non installé"))
+            logger.info(f"Rapatriement annulé : {len(staged)} fichiers préparés non installés")
+            return
+
+        self._restage_config()
+        with self._lock:
+            staged = [name for name in self.files
+                      if name in self.staged and self.results.get(name, PullEvent(name, "")).status in SUCCESS_STATUSES]
+        start = time.perf_counter()
+        for name in staged:
+            try:
+                os.replace(self.staging_path(name), self.dest_path(name))
+            except OSError as e:
+                logger.error(f"  ❌ Installation de {name} impossible : {e}")
+                self._override(PullEvent(name, FAILED, message=f"installation impossible : {e}"))
+                continue
+            self.installed.append(name)
+        self.install_ms = (time.perf_counter() - start) * 1000
+        for name in self.installed:
+            server, digest = self.staged[name]
+            self._remember(name, server, digest)
+        if self.installed:
+            logger.info(f"🔁 {len(self.installed)} fichiers installés en {self.install_ms:.1f} ms : {', '.join(self.installed)}")
+
+    def _fetch_manifest(self, executor: ThreadPoolExecutor):
+        """Le manifeste est lu sur le pool, avec le même délai qu'un fichier : un serveur muet
+        ne fait que désactiver la comparaison par empreinte."""
+        path = self.source_path(xml_manifest.MANIFEST_NAME)
+        future = executor.submit(xml_manifest.read_manifest, path, self.opener)
+        try:
+            self.manifest = future.result(timeout=self.deadline) or {}
+        except Exception as e:
+            logger.warning(f"Manifeste du serveur indisponible ({path}) : {str(e) or 'délai dépassé'}")
+            self.manifest = {}
+
+    def run(self):
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="station-pull")
+        try:
+            os.makedirs(self.dest_folder, exist_ok=True)
+            if self.snapshot_label:
+                self.snapshot_id = SnapshotStore(self.dest_folder).auto_snapshot(self.snapshot_label)
+                if self.snapshot_id:
+                    logger.info(f"📸 Instantané avant copie : {self.snapshot_id}")
+            self._prepare_staging()
+            self._load_state()
+            self._fetch_manifest(executor)
+            names = self._pull_bundle(executor)
+            pending = {executor.submit(self._pull, name): name for name in names}
+            while pending:
+                done, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    self._emit(self._result(name, future))
+                now = time.monotonic()
+                for future, name in list(pending.items()):
+                    with self._lock:
+                        started = self._started_at.get(name)
+                    if self._cancel.is_set() and (started is None or future.cancel()):
+                        pending.pop(future)
+                        self._emit(PullEvent(name, CANCELLED, message="annulé"))
+                    elif started is not None and now - started > self.deadline + POLL_INTERVAL:
+                        with self._lock:
+                            self._abandoned.add(name)
+                        pending.pop(future)
+                        logger.warning(f"  ⏱️ {name} abandonné après {self.deadline:.0f} s")
+                        self._emit(PullEvent(name, TIMEOUT, message=f"délai de {self.deadline:.0f} s dépassé"))
+            self._install()
+        except Exception as e:
+            logger.error(f"Erreur lors de la copie depuis {self.source_root} : {e}", exc_info=True)
+            for name in self.files:
+                self._emit(PullEvent(name, FAILED, message=str(e)))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._save_state()
+            self.elapsed = time.perf_counter() - start
+            self.events.put(PullEvent(None, FINISHED, message=f"{len(self.succeeded)}/{len(self.files)} fichiers"))
@@ -0,0 +1,250 @@
+import hashlib
+import io
+import itertools
+import os
+import shutil
+import threading
+from typing import BinaryIO, Callable, Dict, Optional, Tuple, Union
+
+DEFAULT_ROOT = r"c:\pos\xml"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+Opener = Callable[[str], BinaryIO]
+
+
+def open_binary(path: str) -> BinaryIO:
+    return open(path, 'rb')
+
+
+def new_digest():
+    """Empreinte commune des fichiers xml (manifeste, instantanés, index, watcher) : BLAKE2 sur 20 octets."""
+    return hashlib.blake2b(digest_size=20)
+
+
+def stream_digest(f: BinaryIO) -> str:
+    digest = new_digest()
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    with open(path, 'rb') as f:
+        return stream_digest(f)
+
+
+class StorageBackend:
+    """Accès aux fichiers XML : lecture, écriture atomique (temp + replace), sauvegarde et stat."""
+
+    root = ""
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name) if self.root else name
+
+    def key(self, path: str) -> str:
+        raise NotImplementedError
+
+    def exists(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def stamp(self, path: str) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def open_read(self, path: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def open_write(self, path: str, text: bool = False) -> Union[BinaryIO, io.TextIOBase]:
+        raise NotImplementedError
+
+    def sync(self, f):
+        pass
+
+    def replace(self, src: str, dst: str):
+        raise NotImplementedError
+
+    def remove(self, path: str):
+        raise NotImplementedError
+
+    def backup(self, path: str, backup: str):
+        raise NotImplementedError
+
+    def local_path(self, path: str) -> Optional[str]:
+        return None
+
+    def read_bytes(self, path: str) -> bytes:
+        with self.open_read(path) as f:
+            return f.read()
+
+    def read_text(self, path: str) -> str:
+        data = self.read_bytes(path).decode("utf-8")
+        return data.replace("\r\n", "\n").replace("\r", "\n")
+
+    def write_bytes(self, path: str, data: bytes):
+        tmp = f"{path}.tmp"
+        with self.open_write(tmp) as f:
+            f.write(data)
+        self.replace(tmp, path)
+
+    def discard(self, path: str):
+        try:
+            self.remove(path)
+        except OSError:
+            pass
+
+
+class FileSystemStorage(StorageBackend):
+    def __init__(self, root: str = ""):
+        self.root = root
+
+    def key(self, path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def stamp(self, path: str) -> Tuple[int, int]:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def open_read(self, path: str) -> BinaryIO:
+        return open(path, 'rb')
+
+    def open_write(self, path: str, text: bool = False):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        return open(path, 'w', encoding="utf-8") if text else open(path, 'wb')
+
+    def sync(self, f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def replace(self, src: str, dst: str):
+        os.replace(src, dst)
+
+    def remove(self, path: str):
+        os.remove(path)
+
+    def backup(self, path: str, backup: str):
+        try:
+            os.link(path, backup)
+        except OSError:
+            shutil.copy2(path, backup)
+
+    def local_path(self, path: str) -> Optional[str]:
+        return path
+
+    def read_text(self, path: str) -> str:
+        with open(path, 'r', encoding="utf-8") as f:
+            return f.read()
+
+    def __repr__(self) -> str:
+        return f"FileSystemStorage({self.root!r})"
+
+
+class ShareStorage(FileSystemStorage):
+    """Dossier partagé d'un serveur (\\\\serveur\\xml) : pas de liens physiques sur un partage SMB."""
+
+    def __init__(self, server: str, share: str = "xml"):
+        super().__init__(rf"\\{server}\{share}")
+        self.server = server
+
+    def key(self, path: str) -> str:
+        return os.path.normcase(path)
+
+    def backup(self, path: str, backup: str):
+        shutil.copy2(path, backup)
+
+    def local_path(self, path: str) -> Optional[str]:
+        """Le chemin UNC reste lisible, mais ni instantanés, ni watcher, ni index de menu ne
+        doivent être créés sur le partage du serveur."""
+        return None
+
+    def __repr__(self) -> str:
+        return f"ShareStorage({self.root!r})"
+
+
+class _MemoryWriter(io.BytesIO):
+    def __init__(self, storage: "MemoryStorage", path: str):
+        super().__init__()
+        self._storage = storage
+        self._path = path
+
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return super().write(data)
+
+    def close(self):
+        if not self.closed:
+            self._storage._put(self._path, self.getvalue())
+        super().close()
+
+
+class MemoryStorage(StorageBackend):
+    """Stockage entièrement en mémoire, pour les traitements en lot et les benchmarks."""
+
+    def __init__(self, files: Optional[Dict[str, Union[str, bytes]]] = None, root: str = ""):
+        self.root = root
+        self._files: Dict[str, Tuple[bytes, int]] = {}
+        self._lock = threading.Lock()
+        self._generation = itertools.count(1)
+        for name, data in (files or {}).items():
+            self._put(self.path(name), data.encode("utf-8") if isinstance(data, str) else data)
+
+    def key(self, path: str) -> str:
+        return f"mem:{id(self):x}:{os.path.normcase(os.path.normpath(path))}"
+
+    def _put(self, path: str, data: bytes):
+        with self._lock:
+            self._files[self.key(path)] = (data, next(self._generation))
+
+    def _get(self, path: str) -> Tuple[bytes, int]:
+        with self._lock:
+            try:
+                return self._files[self.key(path)]
+            except KeyError:
+                raise FileNotFoundError(path) from None
+
+    def exists(self, path: str) -> bool:
+        with self._lock:
+            return self.key(path) in self._files
+
+    def stamp(self, path: str) -> Tuple[int, int]:
+        data, generation = self._get(path)
+        return (generation, len(data))
+
+    def open_read(self, path: str) -> BinaryIO:
+        return io.BytesIO(self._get(path)[0])
+
+    def read_bytes(self, path: str) -> bytes:
+        return self._get(path)[0]
+
+    def open_write(self, path: str, text: bool = False):
+        return _MemoryWriter(self, path)
+
+    def replace(self, src: str, dst: str):
+        with self._lock:
+            try:
+                entry = self._files.pop(self.key(src))
+            except KeyError:
+                raise FileNotFoundError(src) from None
+            self._files[self.key(dst)] = entry
+
+    def remove(self, path: str):
+        with self._lock:
+            try:
+                del self._files[self.key(path)]
+            except KeyError:
+                raise FileNotFoundError(path) from None
+
+    def backup(self, path: str, backup: str):
+        data, generation = self._get(path)
+        with self._lock:
+            self._files[self.key(backup)] = (data, generation)
+
+    def __repr__(self) -> str:
+        return f"MemoryStorage({len(self._files)} fichiers)"
+
+
+local_storage = FileSystemStorage()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import os
+import sys
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+from menu_index import KEY_ATTRIBUTES
+
+logger = logging.getLogger(__name__)
+
+DIFF_FILES = ["config.xml", "devices.xml", "layout.xml", "menu.xml"]
+TEXT_KEY = "#text"
+
+ElementMap = Dict[str, Tuple[Optional[str], Dict[str, str]]]
+
+
+def _segment(elem: ET.Element, seen: Dict[str, int]) -> str:
+    """Identifiant stable d'un élément parmi ses frères : attribut clé (ID, Name...) sinon rang."""
+    key = next((elem.get(name) for name in KEY_ATTRIBUTES if elem.get(name)), None)
+    base = f"{elem.tag}[{key}]" if key is not None else elem.tag
+    count = seen.get(base, 0)
+    seen[base] = count + 1
+    if key is not None:
+        return base if count == 0 else f"{base}#{count}"
+    return f"{base}#{count}"
+
+
+def element_map(source) -> ElementMap:
+    """Parcourt le XML en flux et produit {chemin: (chemin parent, attributs)} en une passe."""
+    elements: ElementMap = {}
+    stack: List[Tuple[ET.Element, str, Dict[str, int]]] = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if stack:
+                _, parent_path, seen = stack[-1]
+                path = f"{parent_path}/{_segment(elem, seen)}"
+            else:
+                parent_path, path = None, elem.tag
+            elements[path] = (parent_path, dict(elem.attrib))
+            stack.append((elem, path, {}))
+        else:
+            _, path, _ = stack.pop()
+            text = (elem.text or "").strip()
+            if text:
+                elements[path][1][TEXT_KEY] = text
+            elem.clear()
+            if stack:
+                del stack[-1][0][:]
+    return elements
+
+
+def diff_maps(local: ElementMap, remote: ElementMap) -> Dict[str, List]:
+    """Seule la racine d'un sous-arbre ajouté ou supprimé est rapportée."""
+    added = [path for path, (parent, _) in remote.items() if path not in local and (parent is None or parent in local)]
+    removed = [path for path, (parent, _) in local.items() if path not in remote and (parent is None or parent in remote)]
+    changed = []
+    for path, (_, attrs) in local.items():
+        entry = remote.get(path)
+        if entry is None or entry[1] == attrs:
+            continue
+        other = entry[1]
+        for name in attrs.keys() | other.keys():
+            old, new = attrs.get(name), other.get(name)
+            if old != new:
+                changed.append({"element": path, "attribute": name, "station": old, "server": new})
+    changed.sort(key=lambda change: (change["element"], change["attribute"]))
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def diff_files(local_path: str, remote_path: str) -> Dict:
+    local_exists, remote_exists = os.path.exists(local_path), os.path.exists(remote_path)
+    if not local_exists or not remote_exists:
+        return {"error": "absent de la station" if not local_exists and remote_exists
+                else "absent du serveur" if local_exists else "absent des deux côtés"}
+    try:
+        return diff_maps(element_map(local_path), element_map(remote_path))
+    except ET.ParseError as e:
+        return {"error": f"XML invalide : {e}"}
+
+
+def diff_folders(local_dir: str, remote_dir: str, files: Optional[List[str]] = None) -> Dict[str, Dict]:
+    return {name: diff_files(os.path.join(local_dir, name), os.path.join(remote_dir, name))
+            for name in (files or DIFF_FILES)}
+
+
+def count_differences(report: Dict[str, Dict]) -> int:
+    return sum(1 if "error" in result else
+               len(result["added"]) + len(result["removed"]) + len(result["changed"])
+               for result in report.values())
+
+
+def format_report(report: Dict[str, Dict], limit: int = 50) -> str:
+    lines = []
+    for name, result in report.items():
+        if "error" in result:
+            lines.append(f"❌ {name} : {result['error']}")
+            continue
+        total = len(result["added"]) + len(result["removed"]) + len(result["changed"])
+        if not total:
+            lines.append(f"✅ {name} : identique")
+            continue
+        lines.append(f"⚠️ {name} : {len(result['added'])} ajoutés, {len(result['removed'])} supprimés, "
+                     f"{len(result['changed'])} attributs modifiés")
+        entries = ([f"    + {path} (serveur seulement)" for path in result["added"]]
+                   + [f"    - {path} (station seulement)" for path in result["removed"]]
+                   + [f"    ~ {c['element']} @{c['attribute']} : station={c['station']!r} serveur={c['server']!r}"
+                      for c in result["changed"]])
+        lines.extend(entries[:limit])
+        if len(entries) > limit:
+            lines.append(f"    ... {len(entries) - limit} autres différences")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Différences structurelles entre les xml d'une station et du serveur")
+    parser.add_argument("station", help="Dossier xml de la station (ex: C:\\pos\\xml)")
+    parser.add_argument("server", help="Dossier xml du serveur (ex: \\\\serveur\\xml)")
+    parser.add_argument("--files", nargs="+", default=None, help=f"Fichiers à comparer (défaut : {' '.join(DIFF_FILES)})")
+    parser.add_argument("--limit", type=int, default=50, help="Nombre maximal de différences affichées par fichier")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args(argv)
+
+    report = diff_folders(args.station, args.server, args.files)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print(format_report(report, args.limit))
+        print(f"{count_differences(report)} différences")
+    return 1 if count_differences(report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import shutil
+import time
+import zipfile
+from typing import BinaryIO, Dict, Iterable, Optional
+
+from storage import HASH_CHUNK_SIZE, Opener, StorageBackend, new_digest, open_binary, stream_digest
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "xml-manifest.json"
+MANIFEST_VERSION = 1
+PUBLISHED_FILES = ["config.xml", "menu.xml", "Floor.xml", "layout.xml"]
+BUNDLE_PREFIX = "xml-bundle-"
+BUNDLE_COMPRESSLEVEL = 1
+
+
+class _DigestReader:
+    """Enveloppe de lecture qui calcule l'empreinte du flux au passage."""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.digest = new_digest()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.digest.update(data)
+        return data
+
+
+def build_manifest(storage: StorageBackend, folder: str, names: Optional[Iterable[str]] = None,
+                   previous: Optional[Dict] = None) -> Dict:
+    """Empreinte BLAKE2 de chaque fichier publié ; une entrée du manifeste précédent dont
+    (mtime_ns, taille) n'a pas bougé est reprise telle quelle sans relire le fichier."""
+    known = (previous or {}).get("files", {})
+    files = {}
+    for name in names or PUBLISHED_FILES:
+        path = os.path.join(folder, name)
+        if not storage.exists(path):
+            continue
+        mtime_ns, size = storage.stamp(path)
+        entry = known.get(name)
+        if entry is None or entry["mtime_ns"] != mtime_ns or entry["size"] != size:
+            with storage.open_read(path) as f:
+                entry = {"size": size, "mtime_ns": mtime_ns, "digest": stream_digest(f)}
+        files[name] = entry
+    return {
+        "version": MANIFEST_VERSION,
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": files,
+    }
+
+
+def bundle_name(version: int) -> str:
+    return f"{BUNDLE_PREFIX}{version:06d}.zip"
+
+
+def _write_bundle(storage: StorageBackend, folder: str, names: Iterable[str], version: int) -> Dict:
+    """Écrit l'archive zip des fichiers publiés et retourne leurs entrées de manifeste : chaque
+    fichier est lu une seule fois, l'empreinte est calculée pendant la compression, elle
+    correspond donc exactement au contenu de l'archive."""
+    name = bundle_name(version)
+    path = os.path.join(folder, name)
+    tmp = f"{path}.tmp"
+    files = {}
+    try:
+        with storage.open_write(tmp) as out:
+            with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED, compresslevel=BUNDLE_COMPRESSLEVEL) as zf:
+                for member in names:
+                    source = os.path.join(folder, member)
+                    if not storage.exists(source):
+                        continue
+                    mtime_ns, size = storage.stamp(source)
+                    with storage.open_read(source) as f, zf.open(member, "w", force_zip64=True) as dst:
+                        reader = _DigestReader(f)
+                        shutil.copyfileobj(reader, dst, HASH_CHUNK_SIZE)
+                    files[member] = {"size": size, "mtime_ns": mtime_ns, "digest": reader.digest.hexdigest()}
+            storage.sync(out)
+        storage.replace(tmp, path)
+    except BaseException:
+        storage.discard(tmp)
+        raise
+    with storage.open_read(path) as f:
+        digest = stream_digest(f)
+    bundle = {"name": name, "version": version, "size": storage.stamp(path)[1], "digest": digest}
+    return {"files": files, "bundle": bundle}
+
+
+def _current(storage: StorageBackend, folder: str, names: Iterable[str], previous: Optional[Dict]) -> bool:
+    """Vrai si l'archive du manifeste précédent existe encore et qu'aucun fichier publié n'a
+    bougé depuis (mêmes fichiers, mêmes (mtime_ns, taille))."""
+    old = (previous or {}).get("bundle")
+    if not old or not storage.exists(os.path.join(folder, old["name"])):
+        return False
+    known = previous.get("files", {})
+    present = set()
+    for name in names:
+        path = os.path.join(folder, name)
+        if not storage.exists(path):
+            continue
+        entry = known.get(name)
+        mtime_ns, size = storage.stamp(path)
+        if entry is None or entry["mtime_ns"] != mtime_ns or entry["size"] != size:
+            return False
+        present.add(name)
+    return present == set(known)
+
+
+def parse_manifest(data: bytes) -> Optional[Dict]:
+    try:
+        manifest = json.loads(data.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        logger.warning(f"Manifeste illisible : {e}")
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        logger.warning(f"Version de manifeste non prise en charge : {manifest.get('version') if isinstance(manifest, dict) else '?'}")
+        return None
+    return manifest
+
+
+def read_manifest(path: str, opener: Opener = open_binary) -> Optional[Dict]:
+    try:
+        with opener(path) as f:
+            return parse_manifest(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def publish_manifest(storage: StorageBackend, folder: str, names: Optional[Iterable[str]] = None,
+                     bundle: bool = True) -> Dict:
+    """Publie le manifeste et, si ``bundle``, une archive versionnée des fichiers publiés.
+    L'archive précédente est conservée pour les stations en cours de lecture, l'avant-dernière est supprimée."""
+    path = os.path.join(folder, MANIFEST_NAME)
+    previous = None
+    if storage.exists(path):
+        previous = parse_manifest(storage.read_bytes(path))
+    names = list(names or PUBLISHED_FILES)
+
+    if bundle and _current(storage, folder, names, previous):
+        logger.info(f"Manifeste à jour : {path} (archive {previous['bundle']['name']} reprise)")
+        return previous
+    if not bundle:
+        manifest = build_manifest(storage, folder, names, previous)
+    else:
+        old = (previous or {}).get("bundle") or {}
+        published = _write_bundle(storage, folder, names, old.get("version", 0) + 1)
+        published["bundle"]["previous"] = old.get("name")
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "files": published["files"],
+            "bundle": published["bundle"],
+        }
+
+    storage.write_bytes(path, json.dumps(manifest, indent=2).encode("utf-8"))
+    if bundle and old.get("previous"):
+        storage.discard(os.path.join(folder, old["previous"]))
+    logger.info(f"Manifeste publié : {path} ({len(manifest['files'])} fichiers"
+                + (f", archive {manifest['bundle']['name']})" if bundle else ")"))
+    return manifest
@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from storage import file_digest
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+StatKey = Tuple[int, int, int]
+
+
+class FileChange(NamedTuple):
+    name: str
+    path: str
+    kind: str
+    digest: Optional[str]
+
+
+class XMLFolderWatcher:
+    """Surveille un dossier par sondage : un seul os.scandir par passe, comparaison
+    (mtime_ns, taille, inode), empreinte calculée uniquement pour les fichiers dont le stat a changé.
+    La première passe ne relève que les stat ; l'empreinte d'un fichier n'est calculée qu'à son
+    premier changement. L'intervalle s'allonge tant que rien ne bouge et revient au minimum dès
+    qu'un changement est vu. Avec ``start()`` les passes et les abonnés tournent sur le thread du watcher."""
+
+    def __init__(self, folder: str, min_interval: float = 0.5, max_interval: float = 8.0,
+                 backoff: float = 1.5, suffixes: Tuple[str, ...] = (".xml",)):
+        self.folder = folder
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.suffixes = suffixes
+        self.interval = min_interval
+        self._files: Dict[str, Tuple[StatKey, Optional[str]]] = {}
+        self._primed = False
+        self._listeners: List[Callable[[List[FileChange]], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def subscribe(self, listener: Callable[[List[FileChange]], None]):
+        self._listeners.append(listener)
+
+    def _scan(self) -> Dict[str, Tuple[str, StatKey]]:
+        found = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if not entry.name.lower().endswith(self.suffixes):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                        found[entry.name] = (entry.path, (st.st_mtime_ns, st.st_size, entry.inode()))
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return found
+
+    def poll(self) -> List[FileChange]:
+        changes = []
+        found = self._scan()
+        if not self._primed:
+            self._primed = True
+            self._files = {name: (key, None) for name, (path, key) in found.items()}
+            return []
+        for name, (path, key) in found.items():
+            known = self._files.get(name)
+            if known is not None and known[0] == key:
+                continue
+            try:
+                digest = file_digest(path)
+            except OSError:
+                continue
+            self._files[name] = (key, digest)
+            if known is None:
+                changes.append(FileChange(name, path, CREATED, digest))
+            elif known[1] != digest:
+                changes.append(FileChange(name, path, MODIFIED, digest))
+        for name in [name for name in self._files if name not in found]:
+            del self._files[name]
+            changes.append(FileChange(name, os.path.join(self.folder, name), DELETED, None))
+
+        if changes:
+            self.interval = self.min_interval
+            logger.info("Changements détectés : " + ", ".join(f"{c.name} ({c.kind})" for c in changes))
+            for listener in self._listeners:
+                try:
+                    listener(changes)
+                except Exception as e:
+                    logger.error(f"Erreur dans un abonné du watcher : {e}")
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return changes
+
+    def _run(self):
+        self.poll()
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> "XMLFolderWatcher":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="xml-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None